@@ -0,0 +1,188 @@
+"""Budget and goal alerts, evaluated as transactions arrive.
+
+AlertRules looks at the accounts a write touched and publishes an alert
+to the AlertQueue when one crosses a threshold: its budget health status
+changes (healthy / warning / over_budget), a goal reaches its target, or a
+goal goes on or off track. Clients wait on the queue with a long poll or
+a server-sent-events stream instead of polling accounts.
+
+The queue lives in process memory, so with several worker processes a
+client only sees alerts raised by the worker it is connected to.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from insights.goal_tracker import GoalTracker
+from models.account import AccountType
+from models.timestamps import to_epoch, day_number
+
+# Alerts kept per user for clients to catch up on
+MAX_ALERTS_PER_USER = 100
+
+
+class AlertQueue:
+    """Per-user buffers of recent alerts with waiters.
+
+    Alert ids increase across all users, so a client resumes with the last
+    id it saw.
+    """
+
+    def __init__(self, max_per_user=MAX_ALERTS_PER_USER):
+        self.max_per_user = max_per_user
+        self._alerts = {}  # user_id -> deque of alerts
+        self._next_id = 1
+        self._cond = threading.Condition()
+
+    def publish(self, user_id, alert):
+        with self._cond:
+            alert = {'id': self._next_id, 'created_at': datetime.now().isoformat(), **alert}
+            self._next_id += 1
+            alerts = self._alerts.get(user_id)
+            if alerts is None:
+                alerts = self._alerts[user_id] = deque(maxlen=self.max_per_user)
+            alerts.append(alert)
+            self._cond.notify_all()
+        return alert
+
+    def _after(self, user_id, since):
+        return [alert for alert in self._alerts.get(user_id, ()) if alert['id'] > since]
+
+    def since(self, user_id, since=0):
+        """Alerts for the user newer than id `since`"""
+        with self._cond:
+            return self._after(user_id, since)
+
+    def wait(self, user_id, since=0, timeout=None):
+        """Block until the user has alerts newer than `since` or `timeout` seconds pass"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                alerts = self._after(user_id, since)
+                if alerts:
+                    return alerts
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+
+    def forget_user(self, user_id):
+        """Drop a user's buffered alerts (e.g. when it is evicted as idle)"""
+        with self._cond:
+            self._alerts.pop(user_id, None)
+
+    def last_id(self):
+        with self._cond:
+            return self._next_id - 1
+
+
+class _BudgetState:
+    __slots__ = ('month_start', 'version', 'spending')
+
+    def __init__(self, month_start, version, spending):
+        self.month_start = month_start
+        self.version = version  # account version the spending is current for
+        self.spending = spending
+
+
+class AlertRules:
+    """Evaluates alert rules for the accounts a write touched.
+
+    Budget utilization is kept per account as this month's spending and
+    moved by each batch's delta. It is seeded from the account's daily
+    totals (an O(1) prefix-sum lookup) when an account is first seen in a
+    month, or when its version shows writes the rules weren't told about
+    (e.g. pulled in from another process). Goal status is recomputed from
+    the running totals; an account seen for the first time only records
+    its goal's on-track state, so on/off-track alerts start from the
+    second write.
+    """
+
+    def __init__(self, queue, goal_tracker=None):
+        self.queue = queue
+        self.goal_tracker = goal_tracker or GoalTracker()
+        self._budgets = {}  # (user_id, account_id) -> _BudgetState
+        self._on_track = {}  # (user_id, account_id) -> bool
+        self._lock = threading.Lock()
+
+    def on_transactions(self, user_id, account, transactions, now=None):
+        """Check an account after `transactions` were added to it; returns the alerts raised"""
+        now = now or datetime.now()
+        alerts = []
+        if account.monthly_budget > 0:
+            alerts += self._check_budget(user_id, account, transactions, now)
+        if account.type == AccountType.GOAL and account.target_amount > 0:
+            alerts += self._check_goal(user_id, account, transactions)
+        return [self.queue.publish(user_id, alert) for alert in alerts]
+
+    def _check_budget(self, user_id, account, transactions, now):
+        month_start = day_number(to_epoch(datetime(now.year, now.month, 1)))
+        # Same window as Account.get_monthly_spending: this month and any future-dated days
+        spent = sum(-t.amount for t in transactions if t.amount < 0 and day_number(t.timestamp) >= month_start)
+
+        key = (user_id, account.id)
+        with self._lock:
+            state = self._budgets.get(key)
+            if state is None or state.month_start != month_start or state.version != account.version - 1:
+                after = account.stats.daily.total(month_start)
+                before = after - spent
+                self._budgets[key] = _BudgetState(month_start, account.version, after)
+            else:
+                before = state.spending
+                after = state.spending = before + spent
+                state.version = account.version
+
+        budget = account.monthly_budget
+        old_status = account.get_health_status(before / budget * 100)
+        new_status = account.get_health_status(after / budget * 100)
+        if old_status == new_status:
+            return []
+        return [{
+            'type': 'budget',
+            'account_id': account.id,
+            'account_name': account.name,
+            'previous_status': old_status,
+            'status': new_status,
+            'budget_utilization': round(after / budget * 100, 1),
+            'message': f"{account.name} is now {new_status.replace('_', ' ')} "
+                       f"({after:.2f} of {budget:.2f} spent this month)"
+        }]
+
+    def _check_goal(self, user_id, account, transactions):
+        alerts = []
+        target = account.target_amount
+        after = account.current_balance
+        before = after - sum(t.amount for t in transactions)
+        if before < target <= after:
+            alerts.append({
+                'type': 'goal_reached',
+                'account_id': account.id,
+                'account_name': account.name,
+                'message': f"{account.name} reached its target of {target:.2f}"
+            })
+
+        if account.deadline:
+            progress = self.goal_tracker.calculate_goal_progress(account)
+            on_track = progress.get('on_track') if progress else None
+            key = (user_id, account.id)
+            with self._lock:
+                previous = self._on_track.get(key)
+                self._on_track[key] = on_track
+            if previous is not None and on_track is not None and previous != on_track:
+                alerts.append({
+                    'type': 'goal_on_track' if on_track else 'goal_off_track',
+                    'account_id': account.id,
+                    'account_name': account.name,
+                    'required_monthly': progress['required_monthly'],
+                    'actual_monthly': progress['actual_monthly'],
+                    'message': f"{account.name} is {'back on' if on_track else 'off'} track"
+                })
+        return alerts
+
+    def forget_user(self, user_id):
+        """Drop tracked state for a user (e.g. when it is evicted and reloaded)"""
+        with self._lock:
+            for states in (self._budgets, self._on_track):
+                for key in [key for key in states if key[0] == user_id]:
+                    del states[key]
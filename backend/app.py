@@ -1,73 +1,141 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 from datetime import datetime
-import json
+import atexit
 import os
+import shutil
+import tempfile
+import zipfile
 
 from models.folder import Folder
 from models.account import Account, AccountType
 from models.transaction import Transaction
-from insights.time_analyzer import TimeAnalyzer
-from insights.projection_engine import ProjectionEngine
-from insights.goal_tracker import GoalTracker
+from models.timestamps import check_transaction_date
+from insights.account_insights import compute_account_insights, compute_accounts_insights
+from insights.cache import InsightsCache, DEFAULT_MAX_BYTES
+from insights.jobs import InsightsJobs, DEFAULT_WORKERS
+from insights.user_insights import UserInsights
+from insights.projection_engine import (ProjectionEngine, DEFAULT_HORIZONS, DEFAULT_SIMULATIONS,
+                                        REQUEST_MAX_HORIZON, REQUEST_MAX_SIMULATIONS, REQUEST_MAX_WORK)
+from storage import open_store, advance_revision, build_user_data
+import bulk_import
+import user_export
+from alerts import AlertQueue, AlertRules
+from concurrency import UserLocks
+import dashboard
+import instrumentation
+import serialization
+from user_cache import UserCache, ResidentUsers, DEFAULT_MAX_BYTES as DEFAULT_USER_CACHE_BYTES
+from pagination import TransactionQuery, page_account_transactions, page_user_transactions
 
 app = Flask(__name__)
 CORS(app)
+app.json = serialization.FastJSONProvider(app)
+instrumentation.init_app(app)
+
+# Writes and refreshes of a user's models take its write lock, and anything
+# that reads them (serialization, analyzers) its read lock; other processes
+# are kept out by the store's own write transactions
+user_locks = UserLocks()
+
+# Persistent storage ('memory://' keeps everything in process, e.g. for tests)
+store = open_store(os.environ.get('PENNYPINCHER_STORE', 'sqlite:///pennypincher.db'), locks=user_locks)
+atexit.register(store.close)
+
+# Computed insights, invalidated by new transactions and at midnight
+insights_cache = InsightsCache(
+    max_bytes=int(os.environ.get('PENNYPINCHER_INSIGHTS_CACHE_BYTES', DEFAULT_MAX_BYTES))
+)
+
+# Budget and goal alerts raised by new transactions, for clients to wait on
+alert_queue = AlertQueue()
+alert_rules = AlertRules(alert_queue)
+
+# Longest an alerts long poll may block, and the gap between keep-alives on
+# an alerts stream (seconds)
+MAX_ALERT_WAIT = 30
+ALERT_KEEPALIVE = 15
+
+def _forget_user(user_id):
+    # State kept per user goes with it (a reloaded user's account versions start over)
+    insights_cache.discard_user(user_id)
+    alert_rules.forget_user(user_id)
+    alert_queue.forget_user(user_id)
+
+# Users loaded from the store in this process, least recently used evicted
+# first; stores that keep every user in memory need no cache in front
+if store.resident:
+    users_data = ResidentUsers(store)
+else:
+    users_data = UserCache(
+        max_bytes=int(os.environ.get('PENNYPINCHER_USER_CACHE_BYTES', DEFAULT_USER_CACHE_BYTES)),
+        on_evict=_forget_user
+    )
 
-# In-memory storage 
-users_data = {}
-
-def get_user_data(user_id):
-    if user_id not in users_data:
-        users_data[user_id] = {
-            'folders': {},
-            'accounts': {},
-            'transactions': {},
-            'next_folder_id': 1,
-            'next_account_id': 1,
-            'next_transaction_id': 1
-        }
-        _initialize_default_data(user_id)
-    return users_data[user_id]
-
-def _initialize_default_data(user_id):
-    """Initialize with some default folders and accounts"""
-    user_data = users_data[user_id]
-
-    # Create default folders 
-    default_folders = [
-        {"name": "Essentials", "description": "Basic living expenses", "icon": "🏠"},
-        {"name": "Goals", "description": "Savings goals and targets", "icon": "🎯"},
-        {"name": "Lifestyle", "description": "Discretionary spending", "icon": "🍽️"},
-        {"name": "Investments", "description": "Long-term savings", "icon": "📈"}
-    ]
-
-    for folder_data in default_folders:
-        folder_id = user_data['next_folder_id']
-        folder = Folder(folder_id, folder_data['name'], folder_data['description'], folder_data['icon'])
-        user_data['folders'][folder_id] = folder
-        user_data['next_folder_id'] += 1
-
-    # Create some default accounts
-    default_accounts = [
-        {"name": "Groceries", "type": AccountType.EXPENSE, "folder_id": 1, "monthly_budget": 500},
-        {"name": "Emergency Fund", "type": AccountType.GOAL, "folder_id": 2, "target_amount": 10000},
-        {"name": "Dining Out", "type": AccountType.EXPENSE, "folder_id": 3, "monthly_budget": 200},
-    ]
-    
-    for account_data in default_accounts:
-        account_id = user_data['next_account_id']
-        account = Account(
-            account_id=account_id,
-            name=account_data['name'],
-            account_type=account_data['type'],
-            folder_id=account_data['folder_id'],
-            monthly_budget=account_data.get('monthly_budget', 0),
-            target_amount=account_data.get('target_amount', 0)
-        )
-        user_data['accounts'][account_id] = account
-        user_data['folders'][account_data['folder_id']].add_account(account)
-        user_data['next_account_id'] += 1
+# Worker pool for insights computation ('process' or 'thread' workers)
+insights_jobs = InsightsJobs(
+    insights_cache,
+    workers=int(os.environ.get('PENNYPINCHER_INSIGHTS_WORKERS', DEFAULT_WORKERS)),
+    use_processes=os.environ.get('PENNYPINCHER_INSIGHTS_POOL', 'thread') == 'process',
+    locks=user_locks
+)
+
+# Longest a job poll may block (seconds)
+MAX_JOB_WAIT = 30
+
+# Cache slot for user-wide insights, alongside the per-account entries
+USER_INSIGHTS_KEY = 'user'
+
+def get_user_data(user_id, create=False):
+    """The user's data, loaded from the store on first access.
+
+    A user that doesn't exist yet reads as the defaults without anything
+    being stored or cached; it is only created (with `create=True`, by
+    writes) when there is something to keep.
+    """
+    user_data = users_data.get(user_id)
+    if user_data is not None:
+        if store.shared and store.revision(user_id) != user_data['revision']:
+            with user_locks.write(user_id):
+                # Pick up anything other worker processes wrote for this user
+                if store.refresh_user(user_id, user_data):
+                    users_data.resize(user_id)
+        return user_data
+
+    with user_locks.write(user_id):
+        user_data = users_data.get(user_id)
+        if user_data is None:
+            user_data = store.load_user(user_id)
+            if user_data is None:
+                if not create:
+                    return build_user_data(*_default_data())
+                # The user and their defaults are created in one write, so
+                # other processes never see a half-initialized user
+                user_data = store.create_user(user_id, *_default_data())
+                if user_data is None:
+                    # Another process created the user first
+                    user_data = store.load_user(user_id)
+            users_data.put(user_id, user_data)
+        return user_data
+
+# Default folders and accounts for a new user (ids start at 1)
+DEFAULT_FOLDERS = [
+    ("Essentials", "Basic living expenses", "🏠"),
+    ("Goals", "Savings goals and targets", "🎯"),
+    ("Lifestyle", "Discretionary spending", "🍽️"),
+    ("Investments", "Long-term savings", "📈"),
+]
+DEFAULT_ACCOUNTS = [
+    {"name": "Groceries", "account_type": AccountType.EXPENSE, "folder_id": 1, "monthly_budget": 500},
+    {"name": "Emergency Fund", "account_type": AccountType.GOAL, "folder_id": 2, "target_amount": 10000},
+    {"name": "Dining Out", "account_type": AccountType.EXPENSE, "folder_id": 3, "monthly_budget": 200},
+]
+
+def _default_data():
+    """Fresh default folders and accounts"""
+    folders = [Folder(folder_id, *spec) for folder_id, spec in enumerate(DEFAULT_FOLDERS, start=1)]
+    accounts = [Account(account_id, **spec) for account_id, spec in enumerate(DEFAULT_ACCOUNTS, start=1)]
+    return folders, accounts
 
 # Health check
 @app.route('/api/health', methods=['GET'])
@@ -78,177 +146,408 @@ def health_check():  # FIXED: was health_checl
 @app.route('/api/<user_id>/folders', methods=['GET'])
 def get_folders(user_id):
     user_data = get_user_data(user_id)
-    folders = [folder.to_dict() for folder in user_data['folders'].values()]
-    return jsonify({"folders": folders})
+    with user_locks.read(user_id):
+        folders = [folder.to_dict() for folder in user_data['folders'].values()]
+        return jsonify({"folders": folders})
 
 @app.route('/api/<user_id>/folders', methods=['POST'])
 def create_folder(user_id):
-    user_data = get_user_data(user_id)
-    data = request.json
-
-    folder_id = user_data['next_folder_id']
-    folder = Folder(
-        folder_id=folder_id,
-        name=data['name'],
-        description=data.get('description', ''),
-        icon=data.get('icon', '📁')
-    )
+    with user_locks.write(user_id):
+        user_data = get_user_data(user_id, create=True)
+        data = request.json
+
+        folder_id = store.allocate_ids(user_id, 'folder')
+        folder = Folder(
+            folder_id=folder_id,
+            name=data['name'],
+            description=data.get('description', ''),
+            icon=data.get('icon', '📁')
+        )
 
-    user_data['folders'][folder_id] = folder
-    user_data['next_folder_id'] += 1
+        advance_revision(user_data, store.save_folder(user_id, folder))
+        user_data['folders'][folder_id] = folder
+        users_data.resize(user_id)
 
-    return jsonify({"status": "success", "folder": folder.to_dict()})
+        return jsonify({"status": "success", "folder": folder.to_dict()})
 
 # Account endpoints
 @app.route('/api/<user_id>/accounts', methods=['POST'])
 def create_account(user_id):
-    user_data = get_user_data(user_id)
-    data = request.json
-
-    # Validate folder exists
-    folder_id = data['folder_id']
-    if folder_id not in user_data['folders']:
-        return jsonify({"error": "Folder not found"}), 404
-    
-    account_id = user_data['next_account_id']  # FIXED: was user_id['next_account_id']
-    account = Account(
-        account_id=account_id,
-        name=data['name'],
-        account_type=data['type'],
-        folder_id=folder_id,
-        monthly_budget=data.get('monthly_budget', 0),
-        target_amount=data.get('target_amount', 0),
-        deadline=data.get('deadline'),
-        current_balance=data.get('current_balance', 0)
-    )
+    with user_locks.write(user_id):
+        user_data = get_user_data(user_id, create=True)
+        data = request.json
+
+        # Validate folder exists
+        folder_id = data['folder_id']
+        if folder_id not in user_data['folders']:
+            return jsonify({"error": "Folder not found"}), 404
+
+        try:
+            account_type = AccountType(data['type'])
+        except ValueError:
+            valid = ', '.join(t.value for t in AccountType)
+            return jsonify({"error": f"Invalid account type: {data['type']!r} (expected one of {valid})"}), 400
+
+        account_id = store.allocate_ids(user_id, 'account')
+        account = Account(
+            account_id=account_id,
+            name=data['name'],
+            account_type=account_type,
+            folder_id=folder_id,
+            monthly_budget=data.get('monthly_budget', 0),
+            target_amount=data.get('target_amount', 0),
+            deadline=data.get('deadline'),
+            current_balance=data.get('current_balance', 0)
+        )
 
-    user_data['accounts'][account_id] = account
-    user_data['folders'][folder_id].add_account(account)
-    user_data['next_account_id'] += 1
+        advance_revision(user_data, store.save_account(user_id, account))
+        user_data['accounts'][account_id] = account
+        user_data['folders'][folder_id].add_account(account)
+        users_data.resize(user_id)
 
-    return jsonify({"status": "success", "account": account.to_dict()})
+        return jsonify({"status": "success", "account": account.to_dict()})
 
 @app.route('/api/<user_id>/accounts', methods=['GET'])  # FIXED: added missing /
 def get_accounts(user_id):  # FIXED: was get_users
     user_data = get_user_data(user_id)
-    accounts = [account.to_dict() for account in user_data['accounts'].values()]
-    return jsonify({"accounts": accounts})
+    with user_locks.read(user_id):
+        accounts = [account.to_dict() for account in user_data['accounts'].values()]
+        return jsonify({"accounts": accounts})
 
 @app.route('/api/<user_id>/accounts/<int:account_id>', methods=['GET'])
 def get_account(user_id, account_id):
     user_data = get_user_data(user_id)
-    account = user_data['accounts'].get(account_id)
+    with user_locks.read(user_id):
+        account = user_data['accounts'].get(account_id)
 
-    if not account:
-        return jsonify({"error": "Account not found"}), 404
+        if not account:
+            return jsonify({"error": "Account not found"}), 404
     
-    return jsonify({"account": account.to_dict()})
+        return jsonify({"account": account.to_dict()})
 
 # Transaction endpoints
 @app.route('/api/<user_id>/transactions', methods=['POST'])
 def create_transaction(user_id):
-    user_data = get_user_data(user_id)
-    data = request.json
-
-    # Validate account exists
-    account_id = data['account_id']
-    if account_id not in user_data['accounts']:
-        return jsonify({"error": "Account not found"}), 404
-
-    transaction_id = user_data['next_transaction_id']  # FIXED: was user_id['next_transaction_id']
-    transaction = Transaction(
-        transaction_id=transaction_id,
-        amount=data['amount'],
-        description=data['description'],
-        account_id=account_id,
-        category=data.get('category', ''),
-        date=data.get('date')
-    )
-
-    # Add to account
-    account = user_data['accounts'][account_id]
-    account.add_transaction(transaction)
+    with user_locks.write(user_id):
+        user_data = get_user_data(user_id, create=True)
+        data = request.json
+
+        # Validate account exists
+        account_id = data['account_id']
+        if account_id not in user_data['accounts']:
+            return jsonify({"error": "Account not found"}), 404
+
+        try:
+            # Dates are parsed and validated once here, then stored as epoch timestamps
+            transaction = Transaction(
+                transaction_id=None,
+                amount=data['amount'],
+                description=data['description'],
+                account_id=account_id,
+                category=data.get('category', ''),
+                date=data.get('date')
+            )
+            check_transaction_date(transaction.timestamp)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Only a valid transaction uses up an id
+        transaction_id = transaction.id = store.allocate_ids(user_id, 'transaction')
+
+        advance_revision(user_data, store.save_transactions(user_id, [transaction]))
+
+        # Add to account
+        account = user_data['accounts'][account_id]
+        account.add_transaction(transaction)
+
+        # Index the transaction by id; the row itself lives in the account ledger
+        user_data['transactions'][transaction_id] = account_id
+        users_data.resize(user_id)
+
+        alerts = alert_rules.on_transactions(user_id, account, [transaction])
+
+        return jsonify({"status": "success", "transaction": transaction.to_dict(), "alerts": alerts})
+
+@app.route('/api/<user_id>/transactions/import', methods=['POST'])
+def import_transactions(user_id):
+    """Bulk import a CSV (with header) or NDJSON body, streamed in batches"""
+    with user_locks.write(user_id):
+        user_data = get_user_data(user_id, create=True)
+
+        fmt = request.args.get('format')
+        if fmt is None:
+            fmt = 'ndjson' if 'json' in (request.mimetype or '') else 'csv'
+        if fmt not in bulk_import.FORMATS:
+            return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+
+        batch_size = request.args.get('batch_size', bulk_import.DEFAULT_BATCH_SIZE, type=int)
+        summary = bulk_import.import_stream(
+            store, user_id, user_data, request.stream, fmt, batch_size,
+            on_added=lambda account, transactions: alert_rules.on_transactions(user_id, account, transactions)
+        )
+        users_data.resize(user_id)
 
-    # Store in transactions list
-    user_data['transactions'][transaction_id] = transaction
-    user_data['next_transaction_id'] += 1
+        return jsonify({"status": "success" if summary['aborted'] is None else "partial", **summary})
 
-    return jsonify({"status": "success", "transaction": transaction.to_dict()})
+@app.route('/api/<user_id>/export', methods=['GET'])
+def export_user(user_id):
+    """The user's folders, accounts and transactions as a columnar .npz file"""
+    user_data = get_user_data(user_id)
+    output = tempfile.TemporaryFile()
+    with user_locks.read(user_id):
+        user_export.export_user(user_data, output)
+    output.seek(0)
+    return send_file(output, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'{user_id}.npz')
+
+@app.route('/api/<user_id>/import', methods=['POST'])
+def import_user(user_id):
+    """Create a user from an export; 409 if the user already exists"""
+    with tempfile.TemporaryFile() as upload:
+        shutil.copyfileobj(request.stream, upload)
+        upload.seek(0)
+        try:
+            exported = user_export.open_export(upload)
+        except (ValueError, KeyError, zipfile.BadZipFile) as e:
+            return jsonify({"error": f"Invalid export: {e}"}), 400
+
+    with user_locks.write(user_id):
+        if store.has_user(user_id):
+            return jsonify({"error": "User already exists"}), 409
+        user_data = user_export.import_user(store, user_id, exported)
+        if user_data is None:
+            return jsonify({"error": "User already exists"}), 409
+        users_data.put(user_id, user_data)
+
+        return jsonify({
+            "status": "success",
+            "folders": len(user_data['folders']),
+            "accounts": len(user_data['accounts']),
+            "transactions": len(user_data['transactions'])
+        })
 
 @app.route('/api/<user_id>/accounts/<int:account_id>/transactions', methods=['GET'])
 def get_account_transactions(user_id, account_id):
     user_data = get_user_data(user_id)
-    account = user_data['accounts'].get(account_id)
+    with user_locks.read(user_id):
+        account = user_data['accounts'].get(account_id)
 
-    if not account:
-        return jsonify({"error": "Account not found"}), 404
-    
-    transactions = [t.to_dict() for t in account.transactions]
-    return jsonify({"transactions": transactions})
+        if not account:
+            return jsonify({"error": "Account not found"}), 404
+
+        try:
+            query = TransactionQuery.from_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        transactions, next_cursor = page_account_transactions(account, query)
+        return serialization.stream_json(
+            {"next_cursor": next_cursor, "has_more": next_cursor is not None},
+            "transactions", (t.to_dict() for t in transactions)
+        )
+
+@app.route('/api/<user_id>/transactions', methods=['GET'])
+def get_transactions(user_id):
+    """All of a user's transactions, with the same paging and filters as per account"""
+    user_data = get_user_data(user_id)
+    with user_locks.read(user_id):
+
+        try:
+            query = TransactionQuery.from_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        transactions, next_cursor = page_user_transactions(user_data['accounts'].values(), query)
+        return serialization.stream_json(
+            {"next_cursor": next_cursor, "has_more": next_cursor is not None},
+            "transactions", (t.to_dict() for t in transactions)
+        )
 
 # Insights endpoints
+@app.route('/api/<user_id>/accounts/insights', methods=['GET'])
+def get_accounts_insights(user_id):
+    """Insights for several accounts at once; ?accounts=1,2 (default all),
+    ?parallel=1 analyzes uncached accounts on the worker pool"""
+    user_data = get_user_data(user_id)
+    now = datetime.now()
+    parallel = request.args.get('parallel') == '1'
+    with user_locks.read(user_id):
+        try:
+            selected = request.args.get('accounts', 'all')
+            account_ids = list(user_data['accounts']) if selected == 'all' else _int_list(selected, 'accounts')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        missing = [account_id for account_id in account_ids if account_id not in user_data['accounts']]
+        if missing:
+            return jsonify({"error": f"Account not found: {missing[0]}"}), 404
+
+        results = {}
+        uncached = []
+        for account_id in account_ids:
+            account = user_data['accounts'][account_id]
+            insights = insights_cache.get(user_id, account_id, account.version)
+            if insights is None:
+                uncached.append(account)
+            else:
+                results[account_id] = insights
+
+        if uncached and not parallel:
+            computed = compute_accounts_insights(uncached, now)
+            for account in uncached:
+                insights_cache.put(user_id, account.id, account.version, computed[account.id])
+            results.update(computed)
+
+    if uncached and parallel:
+        # Pool workers take the read lock themselves, so wait for them outside it
+        results.update(zip([account.id for account in uncached],
+                           insights_jobs.compute_many(user_id, uncached, now)))
+
+    return jsonify({"insights": {account_id: results[account_id] for account_id in account_ids}})
+
 @app.route('/api/<user_id>/accounts/<int:account_id>/insights', methods=['GET'])
 def get_account_insights(user_id, account_id):
     user_data = get_user_data(user_id)
-    account = user_data['accounts'].get(account_id)
+    with user_locks.read(user_id):
+        account = user_data['accounts'].get(account_id)
 
-    if not account:
-        return jsonify({"error": "Account not found"}), 404
+        if not account:
+            return jsonify({"error": "Account not found"}), 404
     
-    insights = {}
-
-    # Time-based insights
-    time_analyzer = TimeAnalyzer()
-    time_insights = time_analyzer.analyze_account_patterns(account)
-    if time_insights:
-        insights['time_patterns'] = time_insights
-
-    # Projections
-    projection_engine = ProjectionEngine()
-    projections = projection_engine.generate_account_projections(account)
-    if projections:
-        insights['projections'] = projections
-    
-    # Goal tracking 
-    if account.type.value == 'goal' and account.deadline:
-        goal_tracker = GoalTracker()
-        goal_progress = goal_tracker.calculate_goal_progress(account)
-        if goal_progress:
-            insights['goal_progress'] = goal_progress
+        insights = insights_cache.get_or_compute(user_id, account, compute_account_insights)
+
+        return jsonify({"insights": insights})
 
-    return jsonify({"insights": insights})
+@app.route('/api/<user_id>/accounts/<int:account_id>/insights/jobs', methods=['POST'])
+def submit_insights_job(user_id, account_id):
+    """Compute insights in the background; returns them directly if already cached"""
+    user_data = get_user_data(user_id)
+    with user_locks.read(user_id):
+        account = user_data['accounts'].get(account_id)
+
+        if not account:
+            return jsonify({"error": "Account not found"}), 404
+
+        job, insights = insights_jobs.submit(user_id, account)
+        if job is None:
+            return jsonify({"status": "done", "insights": insights})
+
+        return jsonify(job.to_dict()), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_insights_job(job_id):
+    """Poll a job; ?wait=<seconds> long-polls until it finishes"""
+    job = insights_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    wait = request.args.get('wait', 0, type=float)
+    if wait > 0:
+        insights_jobs.wait(job, min(wait, MAX_JOB_WAIT))
+
+    return jsonify(job.to_dict())
+
+def get_user_insights(user_id, user_data):
+    """User-wide insights, cached until any account changes"""
+    version = tuple((account.id, account.version, account.folder_id) for account in user_data['accounts'].values())
+    insights = insights_cache.get(user_id, USER_INSIGHTS_KEY, version)
+    if insights is None:
+        insights = UserInsights().analyze_user(user_data)
+        insights_cache.put(user_id, USER_INSIGHTS_KEY, version, insights)
+    return insights
+
+@app.route('/api/<user_id>/insights', methods=['GET'])
+def get_user_insights_route(user_id):
+    """Per-folder and per-category breakdowns, burn rate and top patterns across all accounts"""
+    user_data = get_user_data(user_id)
+    with user_locks.read(user_id):
+        return jsonify({"insights": get_user_insights(user_id, user_data)})
+
+def _int_list(value, name):
+    try:
+        return [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {value!r}") from None
+
+@app.route('/api/<user_id>/projections', methods=['GET'])
+def get_projections(user_id):
+    """Monte Carlo balance bands; ?accounts=1,2 (default all), ?horizons=7,30,90, ?simulations=, ?seed="""
+    user_data = get_user_data(user_id)
+    with user_locks.read(user_id):
+
+        try:
+            horizons = _int_list(request.args.get('horizons', ''), 'horizons') or DEFAULT_HORIZONS
+            selected = request.args.get('accounts', 'all')
+            account_ids = list(user_data['accounts']) if selected == 'all' else _int_list(selected, 'accounts')
+            simulations = int(request.args.get('simulations', DEFAULT_SIMULATIONS))
+            seed = request.args.get('seed', type=int)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        missing = [account_id for account_id in account_ids if account_id not in user_data['accounts']]
+        if missing:
+            return jsonify({"error": f"Account not found: {missing[0]}"}), 404
+
+        engine = ProjectionEngine(simulations=simulations, seed=seed, max_simulations=REQUEST_MAX_SIMULATIONS,
+                                  max_horizon=REQUEST_MAX_HORIZON)
+        if engine.work(len(account_ids), horizons) > REQUEST_MAX_WORK:
+            return jsonify({"error": f"Too much to simulate: accounts x simulations x days must be at most "
+                                     f"{REQUEST_MAX_WORK}; ask for fewer accounts, simulations or days"}), 400
+        accounts = [user_data['accounts'][account_id] for account_id in account_ids]
+        return jsonify({"projections": engine.project_accounts(accounts, horizons)})
+
+# Alert endpoints
+@app.route('/api/<user_id>/alerts', methods=['GET'])
+def get_alerts(user_id):
+    """Alerts newer than ?since=<id>; ?wait=<seconds> long-polls until there are some"""
+    since = request.args.get('since', 0, type=int)
+    wait = request.args.get('wait', 0, type=float)
+    if wait > 0:
+        alerts = alert_queue.wait(user_id, since, timeout=min(wait, MAX_ALERT_WAIT))
+    else:
+        alerts = alert_queue.since(user_id, since)
+    return jsonify({"alerts": alerts, "last_id": alerts[-1]['id'] if alerts else since})
+
+@app.route('/api/<user_id>/alerts/stream', methods=['GET'])
+def stream_alerts(user_id):
+    """Server-sent events, resuming after the Last-Event-ID header (or ?since=)"""
+    since = request.headers.get('Last-Event-ID', request.args.get('since', 0), type=int)
+
+    def events(since):
+        yield 'retry: 5000\n\n'
+        while True:
+            alerts = alert_queue.wait(user_id, since, timeout=ALERT_KEEPALIVE)
+            if not alerts:
+                yield ': keep-alive\n\n'
+            for alert in alerts:
+                since = alert['id']
+                yield f"id: {since}\nevent: alert\ndata: {serialization.dumps(alert)}\n\n"
+
+    return Response(events(since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/insights/cache', methods=['GET'])
+def get_insights_cache_stats():
+    return jsonify({"insights_cache": insights_cache.stats(), "insights_jobs": insights_jobs.stats()})
+
+@app.route('/api/users/cache', methods=['GET'])
+def get_user_cache_stats():
+    return jsonify({"user_cache": users_data.stats()})
 
 @app.route('/api/<user_id>/dashboard', methods=['GET'])
 def get_dashboard(user_id):
+    """Dashboard; ?include=, ?fields= and ?mode=summary select what is built"""
     user_data = get_user_data(user_id)
+    with user_locks.read(user_id):
 
-    dashboard_data = {
-        'folders': [],
-        'accounts': [],
-        'total_insights': []  # FIXED: was total_insights (typo)
-    }
-
-    # Add folders with their accounts
-    for folder in user_data['folders'].values():
-        folder_data = folder.to_dict()
-        folder_data['accounts'] = [account.to_dict() for account in folder.accounts]
-        dashboard_data['folders'].append(folder_data)
-
-        # Add accounts to flat list
-        dashboard_data['accounts'].extend(folder_data['accounts'])
-
-    # Generate insights for a few key accounts
-    time_analyzer = TimeAnalyzer()
-    for account in list(user_data['accounts'].values())[:5]:
-        insights = time_analyzer.analyze_account_patterns(account)
-        if insights:
-            dashboard_data['total_insights'].append({
-                'account_name': account.name,
-                'account_icon': '📊', 
-                'insights': insights,
-            })
-    
-    return jsonify(dashboard_data)
+        try:
+            sections, fields = dashboard.parse_selection(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        dashboard_data = dashboard.build_dashboard(user_data, sections, fields,
+                                                   user_insights=lambda: get_user_insights(user_id, user_data))
+        return jsonify(dashboard_data)
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""Offline insights for every user in a store, on a process pool.
+
+    python batch_insights.py --store 'sqlite:///pennypincher.db' --output insights.ndjson --workers 4
+
+Runs the account analyzers (time patterns, projections and goal progress)
+for each user and writes one NDJSON line per user:
+{"user_id": ..., "accounts": {account_id: insights}}. Every user is
+analyzed as of the same `--now`.
+
+User ids are streamed from the store and handed to the workers a chunk
+at a time, with only a few chunks in flight. Each worker loads its users
+itself and drops them once analyzed, so memory stays bounded by a few
+users per worker however many the store holds. The store is opened
+read-only, so a run never writes, snapshots or compacts it. The
+workers are forked: SQLite stores are reopened in each one, while memory
+and log stores are shared with the parent as they were loaded.
+
+Progress and throughput go to stderr while it runs, followed by timing
+per worker.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from multiprocessing import get_context
+
+from insights.account_insights import compute_accounts_insights
+from storage import open_store
+import serialization
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Users per task, and tasks queued per worker
+DEFAULT_CHUNK_SIZE = 16
+TASKS_PER_WORKER = 4
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 2.0
+
+_store = None
+
+
+def _init_worker(url):
+    global _store
+    if _store is None or _store.shared:
+        # Connections must not be shared with the parent after the fork
+        _store = open_store(url, read_only=True)
+
+
+def _analyze_users(user_ids, now):
+    """Worker task: NDJSON lines for a chunk of users, plus timings"""
+    lines = []
+    load_time = compute_time = 0.0
+    accounts = transactions = 0
+    for user_id in user_ids:
+        started = time.perf_counter()
+        user_data = _store.load_user(user_id)
+        loaded = time.perf_counter()
+        load_time += loaded - started
+        if user_data is None:
+            continue  # removed since it was listed
+
+        results = compute_accounts_insights(list(user_data['accounts'].values()), now)
+        lines.append(serialization.dumps({'user_id': user_id, 'accounts': results}))
+        compute_time += time.perf_counter() - loaded
+        accounts += len(user_data['accounts'])
+        transactions += len(user_data['transactions'])
+    return {
+        'pid': os.getpid(),
+        'lines': lines,
+        'users': len(lines),
+        'accounts': accounts,
+        'transactions': transactions,
+        'load_time': load_time,
+        'compute_time': compute_time,
+    }
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Progress:
+    """Running totals, overall and per worker process"""
+
+    def __init__(self, out=sys.stderr, interval=PROGRESS_INTERVAL):
+        self.out = out
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._last_report = self.started
+        self.users = self.accounts = self.transactions = 0
+        self.workers = {}  # pid -> totals
+
+    def add(self, result):
+        self.users += result['users']
+        self.accounts += result['accounts']
+        self.transactions += result['transactions']
+        worker = self.workers.setdefault(result['pid'], {
+            'chunks': 0, 'users': 0, 'transactions': 0, 'load_time': 0.0, 'compute_time': 0.0})
+        worker['chunks'] += 1
+        for key in ('users', 'transactions', 'load_time', 'compute_time'):
+            worker[key] += result[key]
+
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        print(f"{self.users} users, {self.accounts} accounts, {self.transactions} transactions "
+              f"in {elapsed:.1f}s ({self.users / elapsed:.1f} users/s, "
+              f"{self.transactions / elapsed:.0f} transactions/s)", file=self.out)
+
+    def summary(self):
+        self.report()
+        for pid, worker in sorted(self.workers.items()):
+            busy = worker['load_time'] + worker['compute_time']
+            print(f"  worker {pid}: {worker['users']} users in {worker['chunks']} chunks, "
+                  f"load {worker['load_time']:.2f}s, compute {worker['compute_time']:.2f}s"
+                  f" ({worker['users'] / busy if busy else 0:.1f} users/s busy)", file=self.out)
+
+
+def run(url, output, workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE, now=None, limit=None,
+        progress=None):
+    """Analyze every user in the store at `url`, writing NDJSON lines to `output`; returns the Progress"""
+    global _store
+    now = now or datetime.now()
+    progress = progress or Progress()
+    _store = open_store(url, read_only=True)
+    try:
+        user_ids = _store.user_ids()
+        if limit is not None:
+            user_ids = islice(user_ids, limit)
+
+        with get_context('fork').Pool(workers, initializer=_init_worker, initargs=(url,)) as pool:
+            in_flight = deque()
+            for chunk in _chunks(user_ids, chunk_size):
+                in_flight.append(pool.apply_async(_analyze_users, (chunk, now)))
+                # Keep listing only as fast as the workers finish
+                if len(in_flight) >= workers * TASKS_PER_WORKER:
+                    _write(in_flight.popleft().get(), output, progress)
+            while in_flight:
+                _write(in_flight.popleft().get(), output, progress)
+    finally:
+        _store.close()
+        _store = None
+    return progress
+
+
+def _write(result, output, progress):
+    for line in result['lines']:
+        output.write(line)
+        output.write('\n')
+    progress.add(result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--store', default=os.environ.get('PENNYPINCHER_STORE', 'sqlite:///pennypincher.db'))
+    parser.add_argument('--output', default='-', help="NDJSON file to write ('-' for stdout)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--now', type=datetime.fromisoformat, default=None,
+                        help="Analyze as of this ISO date and time (default: now)")
+    parser.add_argument('--limit', type=int, default=None, help="Only the first N users")
+    args = parser.parse_args(argv)
+
+    progress = Progress()
+    if args.output == '-':
+        run(args.store, sys.stdout, args.workers, args.chunk_size, args.now, args.limit, progress)
+    else:
+        with open(args.output, 'w') as output:
+            run(args.store, output, args.workers, args.chunk_size, args.now, args.limit, progress)
+    progress.summary()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Multi-process load test for POST /transactions and GET /dashboard.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_test --workers 1,2,4 --duration 10 --clients 16
+
+For each worker count a fresh sharded SQLite store is created, serve.py
+is started with that many worker processes, and --clients client
+processes send a mix of transaction writes and dashboard reads for
+--users users until --duration seconds pass. Throughput and latency per
+endpoint are printed (and written as JSON with --output), so scaling with
+the number of workers can be read straight off the table.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _request(port, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        return response.status, data
+    finally:
+        conn.close()
+
+
+def _wait_until_up(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if _request(port, 'GET', '/api/health')[0] == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def _client(port, users, deadline, write_ratio, seed):
+    """One client process: returns {endpoint: (latencies, errors)}"""
+    rng = random.Random(seed)
+    results = {'transactions': ([], 0), 'dashboard': ([], 0)}
+    while time.time() < deadline:
+        user = f"load-user-{rng.randrange(users)}"
+        if rng.random() < write_ratio:
+            endpoint = 'transactions'
+            method, path = 'POST', f'/api/{user}/transactions'
+            body = {'account_id': rng.choice((1, 3)), 'amount': -round(rng.uniform(1, 100), 2),
+                    'description': 'load test', 'category': rng.choice(('food', 'fun', 'bills'))}
+        else:
+            endpoint = 'dashboard'
+            method, path, body = 'GET', f'/api/{user}/dashboard', None
+
+        started = time.perf_counter()
+        try:
+            status, _ = _request(port, method, path, body)
+        except OSError:
+            status = None
+        latencies, errors = results[endpoint]
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+        else:
+            results[endpoint] = (latencies, errors + 1)
+    return results
+
+
+def run_workers(workers, clients, users, duration, write_ratio, shards):
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, PENNYPINCHER_STORE=f"sqlite:///{data_dir}/load.db?shards={shards}")
+        server = subprocess.Popen(
+            [sys.executable, 'serve.py', '--workers', str(workers), '--port', str(port), '--quiet'],
+            cwd=BACKEND_DIR, env=env, stderr=subprocess.DEVNULL)
+        try:
+            _wait_until_up(port)
+            # Create every user up front so the timed run measures steady state
+            for user in range(users):
+                _request(port, 'GET', f'/api/load-user-{user}/dashboard')
+
+            deadline = time.time() + duration
+            with multiprocessing.Pool(clients) as pool:
+                per_client = pool.starmap(_client, [
+                    (port, users, deadline, write_ratio, seed) for seed in range(clients)
+                ])
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    summary = {'workers': workers, 'clients': clients, 'users': users, 'duration_seconds': duration}
+    for endpoint in ('transactions', 'dashboard'):
+        latencies = sorted(latency for result in per_client for latency in result[endpoint][0])
+        errors = sum(result[endpoint][1] for result in per_client)
+        summary[endpoint] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'requests_per_second': round(len(latencies) / duration, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+            'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help="comma-separated worker counts")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--users', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.5, help="share of requests that are writes")
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'workers':>7} {'endpoint':>12} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+    for workers in (int(count) for count in args.workers.split(',')):
+        summary = run_workers(workers, args.clients, args.users, args.duration, args.write_ratio, args.shards)
+        results.append(summary)
+        for endpoint in ('transactions', 'dashboard'):
+            stats = summary[endpoint]
+            print(f"{workers:>7} {endpoint:>12} {stats['requests_per_second']:>9} "
+                  f"{stats['p50_ms']!s:>9} {stats['p95_ms']!s:>9} {stats['errors']:>7}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cpu_count': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
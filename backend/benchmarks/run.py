@@ -0,0 +1,186 @@
+"""Benchmark the insights engines, model serialization and API routes.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --sizes 1000,100000,1000000 --output benchmark_results.json
+
+Each benchmark is timed --repeat times per ledger size, and the results
+(min/median/mean seconds) are written as JSON so runs from different
+commits can be compared.
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Benchmarks seed users straight into memory; never touch a real database
+os.environ['PENNYPINCHER_STORE'] = 'memory://'
+
+import numpy as np
+
+import app as api
+from benchmarks.synthetic import generate_user, heaviest_account
+from insights.goal_tracker import GoalTracker
+from insights.projection_engine import ProjectionEngine
+from insights.time_analyzer import TimeAnalyzer
+from insights.user_insights import UserInsights
+from models.account import AccountType
+from storage.log import LogStore
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+BENCH_USER = 'bench-user'
+
+
+def _time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def micro_benchmarks(user_data):
+    """Single-component benchmarks: name -> callable"""
+    expense_account = heaviest_account(user_data, AccountType.EXPENSE)
+    goal_account = heaviest_account(user_data, AccountType.GOAL)
+    accounts = list(user_data['accounts'].values())
+
+    return {
+        'time_analyzer.vectorized': lambda: TimeAnalyzer(vectorized=True).analyze_account_patterns(expense_account),
+        'time_analyzer.python': lambda: TimeAnalyzer(vectorized=False).analyze_account_patterns(expense_account),
+        'projection_engine.generate_account_projections':
+            lambda: ProjectionEngine().generate_account_projections(expense_account),
+        'projection_engine.project_accounts':
+            lambda: ProjectionEngine(seed=0).project_accounts(accounts, (7, 30, 90)),
+        'goal_tracker.calculate_goal_progress': lambda: GoalTracker().calculate_goal_progress(goal_account),
+        'user_insights.analyze_user': lambda: UserInsights().analyze_user(user_data),
+        'account.to_dict': lambda: [account.to_dict() for account in accounts],
+    }
+
+
+def route_benchmarks(user_data):
+    """End-to-end benchmarks through the Flask test client: name -> callable"""
+    client = api.app.test_client()
+    account_id = heaviest_account(user_data, AccountType.EXPENSE).id
+
+    def get(url, cold=False):
+        def run():
+            if cold:
+                api.insights_cache.clear()
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} returned HTTP {response.status_code}")
+        return run
+
+    return {
+        'route.dashboard': get(f'/api/{BENCH_USER}/dashboard', cold=True),
+        'route.dashboard.cached': get(f'/api/{BENCH_USER}/dashboard'),
+        'route.dashboard.summary': get(f'/api/{BENCH_USER}/dashboard?mode=summary'),
+        'route.accounts': get(f'/api/{BENCH_USER}/accounts'),
+        'route.account_insights': get(f'/api/{BENCH_USER}/accounts/{account_id}/insights', cold=True),
+        'route.account_insights.cached': get(f'/api/{BENCH_USER}/accounts/{account_id}/insights'),
+        'route.account_transactions.page': get(f'/api/{BENCH_USER}/accounts/{account_id}/transactions?limit=100'),
+        'route.transactions.page': get(f'/api/{BENCH_USER}/transactions?limit=100&order=desc'),
+    }
+
+
+def log_store_benchmarks(user_data):
+    """Snapshot writing and restart from a snapshot: name -> callable"""
+    directory = tempfile.mkdtemp(prefix='pennypincher-bench-')
+    atexit.register(shutil.rmtree, directory, True)
+    store = LogStore(directory, fsync=False)
+    store.users[BENCH_USER] = user_data
+
+    return {
+        'log_store.snapshot': store.snapshot,
+        'log_store.restart': lambda: LogStore(directory).close(),
+    }
+
+
+def run(sizes, repeat, seed, only=None):
+    results = []
+    for size in sizes:
+        started = time.perf_counter()
+        user_data = generate_user(size, seed=seed)
+        generate_seconds = time.perf_counter() - started
+        print(f"[{size:,} transactions] generated in {generate_seconds:.2f}s", file=sys.stderr)
+
+        api.store.users[BENCH_USER] = user_data
+        api.insights_cache.clear()
+
+        benchmarks = {**micro_benchmarks(user_data), **route_benchmarks(user_data),
+                      **log_store_benchmarks(user_data)}
+        for name, fn in benchmarks.items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+
+            result = {'name': name, 'transactions': size, 'repeat': repeat}
+            try:
+                fn()  # warm-up
+                timings = _time(fn, repeat)
+                result.update({
+                    'min_seconds': min(timings),
+                    'median_seconds': statistics.median(timings),
+                    'mean_seconds': statistics.mean(timings),
+                })
+                print(f"  {name:<48} median {result['median_seconds'] * 1000:10.3f} ms", file=sys.stderr)
+            except Exception as e:
+                result['error'] = str(e)
+                print(f"  {name:<48} ERROR {e}", file=sys.stderr)
+            results.append(result)
+
+        del api.store.users[BENCH_USER]
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated transaction counts")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', help="comma-separated benchmark name prefixes to run")
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    only = args.only.split(',') if args.only else None
+    results = run(sizes, args.repeat, args.seed, only)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
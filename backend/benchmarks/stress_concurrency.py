@@ -0,0 +1,175 @@
+"""Concurrency stress test for one process serving many threads.
+
+Run from the backend directory:
+
+    python -m benchmarks.stress_concurrency --writers 8 --readers 8 --duration 5
+
+Writer threads post transactions (and the odd folder or account) for one
+user through the Flask test client while reader threads hit its insights,
+projections and dashboard and check, under the user's read lock, that
+every ledger is internally consistent. A second user is written to at the
+same time to show it isn't held up. When the run ends the ids, counters
+and per-day totals are checked against the ledgers; any violation is
+printed and the exit status is 1. tests/test_concurrency.py runs a short
+version of the same check.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+os.environ.setdefault('PENNYPINCHER_STORE', 'memory://')
+
+import numpy as np
+
+from app import app, get_user_data, user_locks
+
+USER = 'stress-user'
+OTHER_USER = 'stress-other'
+READ_PATHS = ('dashboard', 'insights', 'projections?simulations=200', 'accounts', 'transactions?limit=50')
+
+
+def check_ledger(account):
+    """Problems with one account's in-memory state (caller holds the read lock)"""
+    ledger = account.ledger
+    problems = []
+    if not len(ledger) == len(ledger.index) == account.stats.count:
+        problems.append(f"account {account.id}: {len(ledger)} rows, {len(ledger.index)} indexed, "
+                        f"{account.stats.count} counted")
+    expected = account.opening_balance + float(ledger.amounts.sum())
+    if abs(account.current_balance - expected) > 1e-6 * max(1.0, abs(expected)):
+        problems.append(f"account {account.id}: balance {account.current_balance} != {expected}")
+    return problems
+
+
+def check_user(user_data):
+    """Problems with a whole user once all threads have stopped"""
+    problems = []
+    accounts = list(user_data['accounts'].values())
+    for account in accounts:
+        problems += check_ledger(account)
+        ledger = account.ledger
+        if len(ledger):
+            days = ledger.days
+            spend = ledger.amounts < 0
+            first, last = int(days.min()), int(days.max())
+            expected = np.bincount(days[spend] - first, weights=-ledger.amounts[spend], minlength=last - first + 1)
+            actual = account.stats.daily.series(first, last)
+            if not np.allclose(actual, expected):
+                problems.append(f"account {account.id}: daily totals drifted from the ledger")
+
+    ids = sorted(int(i) for account in accounts for i in account.ledger.ids)
+    if ids != list(range(1, len(ids) + 1)):
+        problems.append(f"transaction ids are not unique and contiguous ({len(ids)} rows)")
+    if len(user_data['transactions']) != len(ids):
+        problems.append(f"{len(user_data['transactions'])} transactions listed, {len(ids)} in ledgers")
+    for kind in ('folders', 'accounts'):
+        if sorted(user_data[kind]) != list(range(1, len(user_data[kind]) + 1)):
+            problems.append(f"{kind} ids are not unique and contiguous")
+    for account in accounts:
+        if account not in user_data['folders'][account.folder_id].accounts:
+            problems.append(f"account {account.id} missing from folder {account.folder_id}")
+    return problems
+
+
+def writer(client, user_id, deadline, seed, counts, errors):
+    rng = random.Random(seed)
+    account_ids = [1, 3]
+    while time.time() < deadline:
+        roll = rng.random()
+        if roll < 0.01:
+            response = client.post(f'/api/{user_id}/folders', json={'name': f'folder {seed}'})
+            kind = 'folders'
+        elif roll < 0.02:
+            response = client.post(f'/api/{user_id}/accounts', json={
+                'name': f'account {seed}', 'type': 'expense', 'folder_id': 1, 'monthly_budget': 500})
+            kind = 'accounts'
+            if response.status_code == 200:
+                account_ids.append(response.get_json()['account']['id'])
+        else:
+            response = client.post(f'/api/{user_id}/transactions', json={
+                'account_id': rng.choice(account_ids),
+                'amount': round(rng.uniform(-120, 60), 2),
+                'description': 'stress',
+                'category': rng.choice(('food', 'fun', 'bills')),
+            })
+            kind = 'transactions'
+        if response.status_code in (200, 201):
+            counts[kind] += 1
+        else:
+            errors.append(f"POST {kind}: {response.status_code} {response.get_data(as_text=True)[:200]}")
+
+
+def reader(client, deadline, seed, counts, errors, problems):
+    rng = random.Random(seed)
+    user_data = get_user_data(USER, create=True)
+    while time.time() < deadline:
+        path = rng.choice(READ_PATHS)
+        response = client.get(f'/api/{USER}/{path}')
+        if response.status_code == 200:
+            counts['reads'] += 1
+        else:
+            errors.append(f"GET {path}: {response.status_code}")
+
+        with user_locks.read(USER):
+            for account in list(user_data['accounts'].values()):
+                problems += check_ledger(account)
+
+
+def run(writers=8, readers=8, duration=5.0):
+    """Hammer USER for `duration` seconds; returns (counts, other_counts, errors, problems, elapsed)"""
+    # Each thread gets its own client; they all share the app and its state
+    get_user_data(USER, create=True)
+    get_user_data(OTHER_USER, create=True)
+    counts = {'transactions': 0, 'folders': 0, 'accounts': 0, 'reads': 0}
+    other_counts = dict(counts)
+    errors, problems = [], []
+
+    deadline = time.time() + duration
+    threads = [
+        threading.Thread(target=writer, args=(app.test_client(), USER, deadline, seed, counts, errors))
+        for seed in range(writers)
+    ] + [
+        threading.Thread(target=reader, args=(app.test_client(), deadline, seed, counts, errors, problems))
+        for seed in range(readers)
+    ] + [
+        threading.Thread(target=writer, args=(app.test_client(), OTHER_USER, deadline, -1, other_counts, errors))
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    problems += check_user(get_user_data(USER))
+    problems += check_user(get_user_data(OTHER_USER))
+    return counts, other_counts, errors, problems, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5)
+    args = parser.parse_args(argv)
+
+    counts, other_counts, errors, problems, elapsed = run(args.writers, args.readers, args.duration)
+
+    print(f"{counts['transactions']} transactions, {counts['folders']} folders, {counts['accounts']} accounts "
+          f"written in {elapsed:.1f}s ({counts['transactions'] / elapsed:.0f} tx/s)")
+    print(f"{counts['reads']} reads ({counts['reads'] / elapsed:.0f}/s)")
+    print(f"other user: {other_counts['transactions']} transactions ({other_counts['transactions'] / elapsed:.0f} tx/s)")
+    for message in (errors + problems)[:20]:
+        print(f"  {message}")
+    if errors or problems:
+        print(f"FAILED: {len(errors)} errors, {len(problems)} consistency violations")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Seeded synthetic users for benchmarks.
+
+Transactions follow a realistic shape: most spending happens around lunch
+and in the evening, weekends are busier than weekdays, amounts are
+log-normal, and goal accounts receive regular deposits.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from models.account import Account, AccountType
+from models.folder import Folder
+from models.timestamps import to_epoch, MICROS_PER_DAY, MICROS_PER_HOUR
+from models.transaction import Transaction
+from storage.base import empty_user_data
+
+# Relative spending by hour of day (0-23) and weekday (Mon-Sun)
+HOUR_WEIGHTS = np.array([1, 0.5, 0.3, 0.2, 0.2, 0.5, 1.5, 3, 4, 4, 4, 5,
+                         8, 7, 4, 4, 5, 7, 9, 9, 7, 5, 3, 2], dtype=float)
+WEEKDAY_WEIGHTS = np.array([1, 1, 1, 1.1, 1.4, 1.8, 1.5], dtype=float)
+
+CATEGORIES = ['groceries', 'dining', 'transport', 'shopping', 'bills', 'entertainment', 'health', '']
+
+FOLDERS = [
+    ("Essentials", "Basic living expenses", "🏠"),
+    ("Goals", "Savings goals and targets", "🎯"),
+    ("Lifestyle", "Discretionary spending", "🍽️"),
+    ("Investments", "Long-term savings", "📈"),
+]
+
+
+def _sample_timestamps(rng, count, start, days):
+    """Timestamps over `days` days from `start`, shaped by the weekday and hour weights"""
+    day_offsets = np.arange(days)
+    start_weekday = start.weekday()
+    day_weights = WEEKDAY_WEIGHTS[(day_offsets + start_weekday) % 7]
+    day = rng.choice(day_offsets, size=count, p=day_weights / day_weights.sum())
+    hour = rng.choice(24, size=count, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    micros_in_hour = rng.integers(0, MICROS_PER_HOUR, size=count)
+    return to_epoch(start) + day * MICROS_PER_DAY + hour * MICROS_PER_HOUR + micros_in_hour
+
+
+def generate_user(transaction_count, seed=0, account_count=12, days=365, now=None):
+    """Build a user_data dict with `transaction_count` transactions.
+
+    About 60% of transactions go to the first expense account so there is
+    always one heavy account to benchmark single-account analyzers on.
+    """
+    rng = np.random.default_rng(seed)
+    now = now or datetime.now()
+    start = now - timedelta(days=days)
+    user_data = empty_user_data()
+
+    for folder_id, (name, description, icon) in enumerate(FOLDERS, start=1):
+        user_data['folders'][folder_id] = Folder(folder_id, name, description, icon)
+
+    for account_id in range(1, account_count + 1):
+        is_goal = account_id % 4 == 2
+        folder_id = 2 if is_goal else [1, 3, 4][account_id % 3]
+        account = Account(
+            account_id=account_id,
+            name=f"{'Goal' if is_goal else 'Expense'} {account_id}",
+            account_type=AccountType.GOAL if is_goal else AccountType.EXPENSE,
+            folder_id=folder_id,
+            monthly_budget=0 if is_goal else float(rng.integers(100, 2000)),
+            target_amount=float(rng.integers(5000, 50000)) if is_goal else 0,
+            deadline=(now + timedelta(days=int(rng.integers(90, 720)))).isoformat() if is_goal else None
+        )
+        user_data['accounts'][account_id] = account
+        user_data['folders'][folder_id].add_account(account)
+
+    account_ids = np.where(
+        rng.random(transaction_count) < 0.6,
+        1,
+        rng.integers(1, account_count + 1, size=transaction_count)
+    )
+    timestamps = _sample_timestamps(rng, transaction_count, start, days)
+    amounts = -np.round(rng.lognormal(mean=3.0, sigma=0.9, size=transaction_count), 2)
+    is_deposit = (account_ids % 4 == 2)
+    amounts[is_deposit] = np.round(rng.normal(250, 60, size=int(is_deposit.sum())).clip(10), 2)
+    categories = rng.choice(len(CATEGORIES), size=transaction_count)
+
+    # Insert in date order, as a live ledger would receive them
+    order = np.argsort(timestamps, kind='stable')
+    created = to_epoch(now)
+    by_account = {}
+    for transaction_id, row in enumerate(order.tolist(), start=1):
+        account_id = int(account_ids[row])
+        by_account.setdefault(account_id, []).append(Transaction.from_row(
+            transaction_id, float(amounts[row]), f"Synthetic purchase {transaction_id}", account_id,
+            CATEGORIES[categories[row]], int(timestamps[row]), created
+        ))
+        user_data['transactions'][transaction_id] = account_id
+
+    for account_id, transactions in by_account.items():
+        user_data['accounts'][account_id].add_transactions(transactions)
+
+    return user_data
+
+
+def heaviest_account(user_data, account_type=None):
+    """The account with the most transactions (optionally of one type)"""
+    accounts = [
+        account for account in user_data['accounts'].values()
+        if account_type is None or account.type == account_type
+    ]
+    return max(accounts, key=lambda account: account.stats.count)
@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import time
+
+from models.timestamps import check_transaction_date
+from models.transaction import Transaction
+from storage import advance_revision
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+
+# Only the first few row errors are returned so a bad file can't blow up the response
+MAX_REPORTED_ERRORS = 100
+
+FORMATS = ('csv', 'ndjson')
+
+
+def _text_stream(stream):
+    """Wrap a binary request stream for incremental text decoding"""
+    if isinstance(stream, io.RawIOBase):
+        stream = io.BufferedReader(stream)
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+
+def iter_csv_records(stream):
+    """Yield (row_number, record) from a CSV body with a header row"""
+    reader = csv.DictReader(_text_stream(stream))
+    for row_number, record in enumerate(reader, start=1):
+        yield row_number, record
+
+
+def iter_ndjson_records(stream):
+    """Yield (row_number, record) from a newline-delimited JSON body.
+
+    A line that isn't a JSON object is yielded as the ValueError describing it.
+    """
+    row_number = 0
+    for line in _text_stream(stream):
+        line = line.strip()
+        if not line:
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Expected a JSON object")
+        except ValueError as e:
+            record = ValueError(f"Invalid JSON: {e}")
+        yield row_number, record
+
+
+def parse_record(record, accounts):
+    """Validate one imported record and build its Transaction (id assigned later)"""
+    if isinstance(record, Exception):
+        raise record
+
+    try:
+        account_id = int(record['account_id'])
+    except KeyError:
+        raise ValueError("Missing account_id") from None
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid account_id: {record['account_id']!r}") from None
+    if account_id not in accounts:
+        raise ValueError(f"Account not found: {account_id}")
+
+    if record.get('amount') in (None, ''):
+        raise ValueError("Missing amount")
+
+    transaction = Transaction(
+        transaction_id=None,
+        amount=record['amount'],
+        description=record.get('description') or '',
+        account_id=account_id,
+        category=record.get('category') or '',
+        date=record.get('date') or None
+    )
+    check_transaction_date(transaction.timestamp)
+    return transaction
+
+
+class BulkImporter:
+    """Streams records into a user's accounts in batches.
+
+    Rows are parsed one at a time and only the current batch is held in
+    memory; each full batch gets a block of ids from the store, is persisted
+    with a single batched insert and is then added to the account ledgers.
+    `on_added(account, transactions)` is called for each account a batch
+    added to.
+    """
+
+    def __init__(self, store, user_id, user_data, batch_size=DEFAULT_BATCH_SIZE, on_added=None):
+        self.store = store
+        self.user_id = user_id
+        self.user_data = user_data
+        self.on_added = on_added
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.imported = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors = []
+
+    def _record_error(self, row_number, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': str(error)})
+
+    def _flush(self, batch):
+        if not batch:
+            return
+
+        first_id = self.store.allocate_ids(self.user_id, 'transaction', len(batch))
+        by_account = {}
+        for transaction_id, transaction in enumerate(batch, start=first_id):
+            transaction.id = transaction_id
+            by_account.setdefault(transaction.account_id, []).append(transaction)
+
+        advance_revision(self.user_data, self.store.save_transactions(self.user_id, batch))
+
+        accounts = self.user_data['accounts']
+        index = self.user_data['transactions']
+        for account_id, transactions in by_account.items():
+            accounts[account_id].add_transactions(transactions)
+            for transaction in transactions:
+                index[transaction.id] = account_id
+            if self.on_added is not None:
+                self.on_added(accounts[account_id], transactions)
+
+        self.imported += len(batch)
+        self.batches += 1
+
+    def run(self, records):
+        """Import (row_number, record) pairs and return the summary"""
+        started = time.perf_counter()
+        accounts = self.user_data['accounts']
+        batch = []
+        aborted = None
+
+        try:
+            for row_number, record in records:
+                try:
+                    batch.append(parse_record(record, accounts))
+                except (TypeError, ValueError) as e:
+                    self._record_error(row_number, e)
+                    continue
+
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+        except (csv.Error, UnicodeDecodeError) as e:
+            # The body itself is unreadable; keep what was imported so far
+            aborted = str(e)
+
+        self._flush(batch)
+
+        elapsed = time.perf_counter() - started
+        return {
+            'aborted': aborted,
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'batches': self.batches,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round((self.imported + self.failed) / elapsed, 1) if elapsed > 0 else None
+        }
+
+
+def import_stream(store, user_id, user_data, stream, fmt, batch_size=DEFAULT_BATCH_SIZE, on_added=None):
+    """Import a CSV or NDJSON request body into the user's accounts"""
+    records = iter_csv_records(stream) if fmt == 'csv' else iter_ndjson_records(stream)
+    return BulkImporter(store, user_id, user_data, batch_size, on_added).run(records)
@@ -0,0 +1,110 @@
+"""Per-user read/write locking.
+
+Writers (new folders, accounts and transactions, and refreshes from the
+store) hold a user's write lock while they change the in-memory models;
+analyzers and serializers hold the read lock, so they always see every
+transaction either fully applied or not at all. Locks are striped: users
+hash onto a fixed set of locks, so memory stays bounded and unrelated
+users only contend when they share a stripe.
+"""
+import threading
+import zlib
+from contextlib import contextmanager
+
+DEFAULT_STRIPES = 64
+
+
+class ReadWriteLock:
+    """Many readers or one writer.
+
+    Waiting writers hold back new readers so a steady stream of reads can't
+    starve them, and a writer finishing lets the readers already waiting go
+    before the next writer, so a steady stream of writes can't starve reads
+    either. Both sides are reentrant, and the thread holding the write lock
+    may also take the read lock. A reader must not try to take the write
+    lock (there is no upgrade).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+        self._readers_waiting = 0
+        self._read_grants = 0  # readers let in ahead of waiting writers
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        depth = getattr(self._local, 'reads', 0)
+        if depth or self._writer == me:
+            # Already reading, or reading our own writes
+            self._local.reads = depth + 1
+            try:
+                yield
+            finally:
+                self._local.reads = depth
+            return
+
+        with self._cond:
+            self._readers_waiting += 1
+            try:
+                while self._writer is not None or (self._writers_waiting and not self._read_grants):
+                    self._cond.wait()
+            finally:
+                self._readers_waiting -= 1
+            if self._read_grants:
+                self._read_grants -= 1
+            self._readers += 1
+        self._local.reads = 1
+        try:
+            yield
+        finally:
+            self._local.reads = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+            else:
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers or self._read_grants:
+                        self._cond.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer = me
+                self._write_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._read_grants = self._readers_waiting
+                    self._cond.notify_all()
+
+
+class UserLocks:
+    """Striped read/write locks keyed by user id"""
+
+    def __init__(self, stripes=DEFAULT_STRIPES):
+        self._locks = [ReadWriteLock() for _ in range(stripes)]
+
+    def lock_for(self, user_id):
+        return self._locks[zlib.crc32(str(user_id).encode()) % len(self._locks)]
+
+    def read(self, user_id):
+        return self.lock_for(user_id).read()
+
+    def write(self, user_id):
+        return self.lock_for(user_id).write()
@@ -0,0 +1,104 @@
+# Sections a dashboard request can ask for via ?include=
+SECTIONS = ('folders', 'folder_accounts', 'accounts', 'insights', 'summary')
+DEFAULT_SECTIONS = ('folders', 'folder_accounts', 'accounts', 'insights')
+
+
+def parse_selection(args):
+    """Read include=, mode= and fields= into (sections, account_fields)"""
+    if args.get('mode') == 'summary':
+        sections = {'summary'}
+    elif args.get('include'):
+        sections = {section.strip() for section in args['include'].split(',') if section.strip()}
+        unknown = sections - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown dashboard sections: {', '.join(sorted(unknown))}")
+    else:
+        sections = set(DEFAULT_SECTIONS)
+
+    fields = None
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+    return sections, fields
+
+
+def _folder_summary(folder):
+    """Per-folder totals from each account's running aggregates (no ledger scans)"""
+    summary = {
+        'id': folder.id,
+        'name': folder.name,
+        'icon': folder.icon,
+        'account_count': len(folder.accounts),
+        'total_balance': 0.0,
+        'monthly_budget': 0.0,
+        'monthly_spending': 0.0,
+        'transaction_count': 0,
+        'health': {'healthy': 0, 'warning': 0, 'over_budget': 0}
+    }
+    for account in folder.accounts:
+        summary['total_balance'] += account.current_balance
+        summary['monthly_budget'] += account.monthly_budget
+        summary['monthly_spending'] += account.get_monthly_spending()
+        summary['transaction_count'] += account.stats.count
+        summary['health'][account.get_health_status()] += 1
+
+    for key in ('total_balance', 'monthly_budget', 'monthly_spending'):
+        summary[key] = round(summary[key], 2)
+    return summary
+
+
+def build_dashboard(user_data, sections, fields=None, user_insights=None):
+    """Assemble the requested dashboard sections.
+
+    Each account is converted with to_dict at most once, and the same dict
+    is shared by the nested and flat account lists. `user_insights()`
+    returns UserInsights.analyze_user() for the user (possibly cached); it
+    is only called when the insights section is requested.
+    """
+    dashboard_data = {}
+    account_dicts = {}
+
+    def account_dict(account):
+        if account.id not in account_dicts:
+            account_dicts[account.id] = account.to_dict(fields)
+        return account_dicts[account.id]
+
+    if 'folders' in sections:
+        dashboard_data['folders'] = []
+        for folder in user_data['folders'].values():
+            folder_data = folder.to_dict()
+            if 'folder_accounts' in sections:
+                folder_data['accounts'] = [account_dict(account) for account in folder.accounts]
+            dashboard_data['folders'].append(folder_data)
+
+    if 'accounts' in sections:
+        dashboard_data['accounts'] = [
+            account_dict(account)
+            for folder in user_data['folders'].values()
+            for account in folder.accounts
+        ]
+
+    if 'insights' in sections:
+        dashboard_data['total_insights'] = []  # FIXED: was total_insights (typo)
+        user_wide = user_insights()
+        for account in user_data['accounts'].values():
+            insights = user_wide['accounts'].get(account.id)
+            if insights:
+                dashboard_data['total_insights'].append({
+                    'account_name': account.name,
+                    'account_icon': '📊',
+                    'insights': insights,
+                })
+        dashboard_data['user_insights'] = {key: value for key, value in user_wide.items() if key != 'accounts'}
+
+    if 'summary' in sections:
+        folders = [_folder_summary(folder) for folder in user_data['folders'].values()]
+        dashboard_data['summary'] = {
+            'folders': folders,
+            'total_balance': round(sum(folder['total_balance'] for folder in folders), 2),
+            'monthly_budget': round(sum(folder['monthly_budget'] for folder in folders), 2),
+            'monthly_spending': round(sum(folder['monthly_spending'] for folder in folders), 2),
+            'account_count': len(user_data['accounts']),
+            'transaction_count': sum(folder['transaction_count'] for folder in folders)
+        }
+
+    return dashboard_data
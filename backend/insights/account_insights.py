@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from insights.time_analyzer import TimeAnalyzer
+from insights.projection_engine import ProjectionEngine
+from insights.goal_tracker import GoalTracker
+
+def compute_account_insights(account, now=None):
+    """Run every analyzer that applies to an account"""
+    return compute_accounts_insights([account], now)[account.id]
+
+def compute_accounts_insights(accounts, now=None):
+    """Insights for several accounts: {account_id: insights}.
+
+    One set of analyzers and one `now` (so the same 30/90-day windows) is
+    shared by every account.
+    """
+    now = now or datetime.now()
+    time_analyzer = TimeAnalyzer()
+    projection_engine = ProjectionEngine()
+    goal_tracker = GoalTracker()
+
+    results = {}
+    for account in accounts:
+        insights = {}
+
+        # Time-based insights
+        time_insights = time_analyzer.analyze_account_patterns(account)
+        if time_insights:
+            insights['time_patterns'] = time_insights
+
+        # Projections
+        projections = projection_engine.generate_account_projections(account, now=now)
+        if projections:
+            insights['projections'] = projections
+
+        # Goal tracking
+        if account.type.value == 'goal' and account.deadline:
+            goal_progress = goal_tracker.calculate_goal_progress(account, now)
+            if goal_progress:
+                insights['goal_progress'] = goal_progress
+
+        results[account.id] = insights
+    return results
@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import serialization
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+class _Entry:
+    __slots__ = ('version', 'day', 'value', 'size')
+
+    def __init__(self, version, day, value, size):
+        self.version = version
+        self.day = day
+        self.value = value
+        self.size = size
+
+
+class InsightsCache:
+    """LRU cache of computed insights per (user_id, account_id).
+
+    Each entry remembers the account version it was computed from, so any
+    new transaction invalidates it. Entries also expire when the day
+    changes, because the "last 30/90 days" windows move with the calendar.
+    Memory use is capped by the approximate JSON size of the cached values.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self, user_id, account_id, version):
+        """Return cached insights, or None on a miss"""
+        key = (user_id, account_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.version != version or entry.day != date.today()):
+                if entry.version == version:
+                    self.expirations += 1
+                self._drop(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, user_id, account_id, version, value):
+        size = len(serialization.dumps(value))
+        if size > self.max_bytes:
+            return
+
+        key = (user_id, account_id)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(version, date.today(), value, size)
+            self._bytes += size
+
+            # Evict least recently used entries until we're under the cap
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def get_or_compute(self, user_id, account, compute):
+        """Return cached insights for the account, computing them on a miss"""
+        version = account.version
+        value = self.get(user_id, account.id, version)
+        if value is None:
+            # Computed outside the lock so other accounts aren't blocked
+            value = compute(account)
+            self.put(user_id, account.id, version, value)
+        return value
+
+    def discard_user(self, user_id):
+        """Drop every entry for a user (e.g. when it is reloaded from the store)"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
@@ -1,15 +1,18 @@
 from datetime import datetime, timedelta
-import statistics 
+
+from instrumentation import timed
+from models.timestamps import to_epoch, MICROS_PER_DAY
 
 class GoalTracker:
-    def calculate_goal_progress(self, account):
+    @timed('analyzer')
+    def calculate_goal_progress(self, account, now=None):
         """Track progress for goal accounts with deadlines"""
-        if account.value != 'goal' or not account.deadline:
+        if account.type.value != 'goal' or not account.deadline:
             return None
 
         try:
             deadline = datetime.fromisoformat(account.deadline)
-            today = datetime.now()
+            today = now or datetime.now()
 
             if today > deadline:
                 return {'status': 'expired', 'message': 'Deadline has passed'}
@@ -32,7 +35,7 @@ class GoalTracker:
             required_monthly = amount_needed / months_remaining if months_remaining > 0 else amount_needed
 
             # Calculate actual monthly contributions (last 3 months)
-            actual_monthly = self._calculate_actual_monthly(account)
+            actual_monthly = self._calculate_actual_monthly(account, today)
 
             # Determine if on track
             on_track = actual_monthly >= required_monthly * 0.8 # 20& buffer
@@ -44,58 +47,48 @@ class GoalTracker:
                 'required_monthly': round(required_monthly, 2),
                 'actual_monthly': round(actual_monthly, 2),
                 'amount_needed': round(amount_needed, 2),
-                'confidence': self._calculate_confidence(actual_monthly, account.transactions)
+                'confidence': self._calculate_confidence(actual_monthly, account.stats)
             }
         
         except Exception as e:
             print(f"Error calculating goal progress: {e}")
             return None
     
-    def _calculate_actual_monthly(self, account):
+    def _calculate_actual_monthly(self, account, now=None):
         """Calculate actual monthly contributions"""
         # Look at income transactions to this account (positive amounts)
-        income_transactions = [t for t in account.transactions if t.amount > 0]
+        income = account.stats.income
 
-        if not income_transactions:
+        if not income.count:
             return 0
         
         # Calculate average monthly contribution from last 3 months 
-        three_months_ago = datetime.now() - timedelta(days=90)
-        recent_contributions = [
-            t for t in income_transactions
-            if datetime.fromisoformat(t.date) >= three_months_ago
-        ]
+        three_months_ago = to_epoch((now or datetime.now()) - timedelta(days=90))
+        total_contributions, first, last = account.window_totals(three_months_ago, income=True)
 
-        if not recent_contributions:
+        if first is None:
             # Use all contributions if none in last 3 months
-            recent_contributions = income_transactions
-        
-        total_contributions = sum(t.amount for t in recent_contributions)
+            total_contributions, first, last = income.total, income.min_timestamp, income.max_timestamp
 
         # Calculate days covered and covert to monthly rate
-        dates = [datetime.fromisoformat(t.date) for t in recent_contributions]
-        if dates:
-            days_covered = (max(dates) - min(dates)).days + 1
-            monthly_rate = total_contributions / (days_covered / 30.44)
-        else:
-            monthly_rate = total_contributions
+        days_covered = (last - first) // MICROS_PER_DAY + 1
+        monthly_rate = total_contributions / (days_covered / 30.44)
         
         return monthly_rate
     
-    def _calculate_confidence(self, actual_monthly, transactions):
+    def _calculate_confidence(self, actual_monthly, stats):
         """Calculate confidence in the projection"""
-        if not transactions:
+        if not stats.count:
             return 0.3
         
         # More transactions = higher confidence
-        transaction_count = len(transactions)
+        transaction_count = stats.count
         count_confidence = min(0.5, transaction_count / 20)
 
         # Consistency of contributions
-        income_transactions = [t for t in transactions if t.amount > 0]
-        if len(income_transactions) > 1:
-            amounts = [t.amount for t in income_transactions]
-            consistency = 1 - (statistics.stdev(amounts) / statistics.mean(amounts))
+        income = stats.income
+        if income.count > 1:
+            consistency = 1 - (income.stdev() / income.mean)
             consistency_confidence = max(0, min(0.5, consistency))
         else:
             consistency_confidence = 0.2
@@ -0,0 +1,152 @@
+import contextlib
+import contextvars
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+
+from insights.account_insights import compute_account_insights
+
+DEFAULT_WORKERS = 4
+
+# Finished jobs kept around for polling before the oldest are dropped
+MAX_FINISHED_JOBS = 1000
+
+
+def _compute_pickled(payload, now=None):
+    """Process-pool entry point: analyze an account snapshot"""
+    return compute_account_insights(pickle.loads(payload), now)
+
+
+class InsightsJob:
+    def __init__(self, user_id, account, future):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.account_id = account.id
+        self.version = account.version
+        self.future = future
+        self.created_at = time.time()
+
+    @property
+    def status(self):
+        if not self.future.done():
+            return 'running' if self.future.running() else 'pending'
+        return 'failed' if self.future.exception() else 'done'
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'account_id': self.account_id,
+            'version': self.version
+        }
+        if data['status'] == 'done':
+            data['insights'] = self.future.result()
+        elif data['status'] == 'failed':
+            data['error'] = str(self.future.exception())
+        return data
+
+
+class InsightsJobs:
+    """Runs account analyses on a worker pool instead of the request thread.
+
+    Results land in the shared InsightsCache. Submitting an account that is
+    already cached returns the cached insights instead of a job, and
+    submitting one that is already being computed returns the running job.
+
+    With `locks` (a UserLocks), thread workers analyze under the user's read
+    lock and process workers get a snapshot pickled under it, so a job never
+    sees a half-applied write.
+    """
+
+    def __init__(self, cache, workers=DEFAULT_WORKERS, use_processes=False, locks=None):
+        self.cache = cache
+        self.use_processes = use_processes
+        self.locks = locks
+        pool = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self.executor = pool(max_workers=workers)
+        self._jobs = OrderedDict()
+        self._in_flight = {}  # (user_id, account_id, version) -> job
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, account, now=None):
+        """Return (job, None) for a new or running job, or (None, insights) if cached"""
+        cached = self.cache.get(user_id, account.id, account.version)
+        if cached is not None:
+            return None, cached
+
+        key = (user_id, account.id, account.version)
+        if self.use_processes:
+            # Snapshot outside self._lock so a queued writer can't wedge other submitters
+            with self._reading(user_id):
+                payload = pickle.dumps(account)
+
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None:
+                return job, None
+
+            if self.use_processes:
+                future = self.executor.submit(_compute_pickled, payload, now)
+            else:
+                # Carry the request context so scanned rows count toward its route
+                future = self.executor.submit(contextvars.copy_context().run, self._compute, user_id, account, now)
+            job = InsightsJob(user_id, account, future)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+            self._trim()
+
+        job.future.add_done_callback(lambda future: self._finished(key, job))
+        return job, None
+
+    def _reading(self, user_id):
+        return self.locks.read(user_id) if self.locks is not None else contextlib.nullcontext()
+
+    def _compute(self, user_id, account, now=None):
+        with self._reading(user_id):
+            return compute_account_insights(account, now)
+
+    def _finished(self, key, job):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if job.future.exception() is None:
+            self.cache.put(job.user_id, job.account_id, job.version, job.future.result())
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.future.done()]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job, timeout):
+        """Block until the job finishes or `timeout` seconds pass (long-poll)"""
+        wait([job.future], timeout=timeout)
+        return job
+
+    def compute_many(self, user_id, accounts, now=None):
+        """Insights for several accounts, analyzing the uncached ones in parallel.
+
+        Don't call this while holding the user's read lock: the workers need
+        it too, and a queued writer would block them behind this thread.
+        """
+        results = []
+        for account in accounts:
+            job, insights = self.submit(user_id, account, now)
+            results.append(job.future if job else insights)
+        return [
+            result.result() if hasattr(result, 'result') else result
+            for result in results
+        ]
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ('pending', 'running', 'done', 'failed')}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,50 +1,163 @@
 from datetime import datetime, timedelta
-import statistics
+
+import numpy as np
+
+from instrumentation import timed
+from models.timestamps import to_epoch, day_number, MICROS_PER_DAY
+
+DEFAULT_HORIZONS = (7, 30)
+MAX_HORIZON = 3650
+
+DEFAULT_SIMULATIONS = 2000
+MAX_SIMULATIONS = 20000
+
+# Tighter limits for projections requested over HTTP; the ones above are
+# for offline and batch use. Work is accounts x simulations x days.
+REQUEST_MAX_HORIZON = 366
+REQUEST_MAX_SIMULATIONS = 5000
+REQUEST_MAX_WORK = 20_000_000
+
+# Days of history the Monte Carlo resamples daily spend from
+LOOKBACK_DAYS = 90
+
+PERCENTILES = (10, 50, 90)
 
 class ProjectionEngine:
-    def generate_account_projections(self, account, days_ahead=30):
-        """Generate 1-week and 1-month projections for an account"""
-        if not account.transactions:
-            return None
+    """Balance projections for accounts.
+
+    generate_account_projections() gives the mean-rate projection used in
+    account insights; project_accounts() runs a Monte Carlo over resampled
+    daily spend for many accounts and horizons at once. Pass `seed` for
+    reproducible simulations. Simulations and horizons are clamped to
+    `max_simulations` and `max_horizon`.
+    """
+
+    def __init__(self, simulations=DEFAULT_SIMULATIONS, seed=None, lookback_days=LOOKBACK_DAYS,
+                 max_simulations=MAX_SIMULATIONS, max_horizon=MAX_HORIZON):
+        self.simulations = max(1, min(simulations, max_simulations))
+        self.seed = seed
+        self.lookback_days = lookback_days
+        self.max_horizon = max_horizon
+
+    def clamp_horizons(self, horizons):
+        """Distinct horizons in days, sorted and clamped to 1..max_horizon"""
+        return sorted({max(1, min(int(days), self.max_horizon)) for days in horizons})
 
-        expenses = [t for t in account.transactions if t.amount < 0]
+    def work(self, account_count, horizons):
+        """Simulated account-days project_accounts would compute"""
+        return account_count * self.simulations * max(self.clamp_horizons(horizons), default=0)
 
-        if not expenses:
+    @timed('analyzer')
+    def generate_account_projections(self, account, days_ahead=30, now=None):
+        """Generate 1-week and 1-month projections (plus `days_ahead`) for an account"""
+        if not account.stats.expenses.count:
             return None
 
         # Calculate daily spending rate
-        daily_rate = self._calculate_daily_spending_rate(expenses)
+        daily_rate = self._calculate_daily_spending_rate(account, now)
         
         projections = {
             '1_week': self._project_balance(account.current_balance, daily_rate, 7),
             '1_month': self._project_balance(account.current_balance, daily_rate, 30)
         }
+        if days_ahead not in (7, 30):
+            projections[f'{days_ahead}_days'] = self._project_balance(account.current_balance, daily_rate, days_ahead)
 
         return projections 
 
-    def _calculate_daily_spending_rate(self, expenses):
+    def daily_spend_history(self, account, today):
+        """Spend per calendar day (zero-filled) over the lookback window ending `today`.
+
+        Falls back to the account's whole expense history when nothing was
+        spent inside the window. Empty when the account has no expenses.
+        """
+        daily = account.stats.daily
+        start = today - self.lookback_days + 1
+        if daily.count(start, today):
+            return daily.series(daily.first_active_day(start), today)
+
+        expenses = account.stats.expenses
+        if not expenses.count:
+            return np.zeros(0)
+        return daily.series(day_number(expenses.min_timestamp), day_number(expenses.max_timestamp))
+
+    @timed('analyzer')
+    def project_accounts(self, accounts, horizons=DEFAULT_HORIZONS, now=None):
+        """P10/P50/P90 spending and balance bands for each account and horizon.
+
+        Each simulated day draws one day from the account's spend history;
+        all accounts and simulations advance together as one array, so the
+        cost grows with the longest horizon rather than with the number of
+        accounts. Returns {account_id: projection}, with None for accounts
+        that have no expenses.
+        """
+        horizons = self.clamp_horizons(horizons)
+        today = day_number(to_epoch(now))
+
+        results = {account.id: None for account in accounts}
+        histories = []
+        simulated = []
+        for account in accounts:
+            history = self.daily_spend_history(account, today)
+            if len(history):
+                histories.append(history)
+                simulated.append(account)
+        if not simulated:
+            return results
+
+        lengths = np.array([len(history) for history in histories])
+        padded = np.zeros((len(histories), lengths.max()))
+        for i, history in enumerate(histories):
+            padded[i, :len(history)] = history
+
+        rng = np.random.default_rng(self.seed)
+        rows = np.arange(len(histories))[:, None]
+        spent = np.zeros((len(histories), self.simulations))
+        at_horizon = {}
+        for day in range(1, horizons[-1] + 1):
+            picks = (rng.random(spent.shape) * lengths[:, None]).astype(np.intp)
+            spent += padded[rows, picks]
+            if day in horizons:
+                at_horizon[day] = np.percentile(spent, PERCENTILES, axis=1)
+
+        for i, account in enumerate(simulated):
+            balance = account.current_balance
+            bands = {}
+            for days in horizons:
+                p10, p50, p90 = (round(float(value), 2) for value in at_horizon[days][:, i])
+                bands[str(days)] = {
+                    'projected_spending': {'p10': p10, 'p50': p50, 'p90': p90},
+                    # High spending means a low balance, so the bands flip
+                    'projected_balance': {
+                        'p10': round(balance - p90, 2),
+                        'p50': round(balance - p50, 2),
+                        'p90': round(balance - p10, 2)
+                    }
+                }
+            results[account.id] = {
+                'daily_rate': round(float(histories[i].mean()), 2),
+                'history_days': int(lengths[i]),
+                'simulations': self.simulations,
+                'horizons': bands
+            }
+        return results
+
+    def _calculate_daily_spending_rate(self, account, now=None):
         """Calculate average daily spending from historical date"""
-        if not expenses:
+        expenses = account.stats.expenses
+        if not expenses.count:
             return 0
         
         # Use last 30 days for calculation
-        cutoff_date = datetime.now() - timedelta(days=30)
-        recent_expenses = [
-            t for t in expenses
-            if datetime.fromisoformat(t.date) >= cutoff_date
-        ]
+        cutoff = to_epoch((now or datetime.now()) - timedelta(days=30))
+        total_spending, first, last = account.window_totals(cutoff)
 
-        if not recent_expenses:
+        if first is None:
             # Fallback to all expenses
-            recent_expenses = expenses
-
-        # Calculate total spending and days covered
-        dates = [datetime.fromisoformat(t.date) for t in recent_expenses]
-        min_date = min(dates)
-        max_date = max(dates)
+            total_spending, first, last = expenses.total, expenses.min_timestamp, expenses.max_timestamp
 
-        days_covered = (max_date - min_date).days + 1
-        total_spending = sum(abs(t.amount) for t in recent_expenses)
+        # Calculate days covered
+        days_covered = (last - first) // MICROS_PER_DAY + 1
 
         if days_covered > 0:
             return total_spending / days_covered 
@@ -1,71 +1,153 @@
-from datetime import datetime, timedelta
+import math
 import statistics
-from collections import defaultdict
+
+import numpy as np
+
+from instrumentation import timed, record_scan
+from models.timestamps import MICROS_PER_DAY
+
+# Hours are [start, end); a bucket with start > end wraps past midnight
+DEFAULT_TIME_BUCKETS = {
+    'early_morning': (5, 9),
+    'midday': (9, 16),
+    'evening': (16, 21),
+    'late_night': (21, 5)
+}
+
+TIME_BUCKET_LABELS = {
+    'early_morning': 'Early morning (5 - 9 AM)',
+    'midday': 'Midday (9 AM - 4 PM)',
+    'evening': 'Evening (4 - 9 PM)',
+    'late_night': 'Late night (9 PM - 5 AM)'
+}
+
+def _hour_label(hour):
+    hour %= 24
+    return f"{hour % 12 or 12} {'AM' if hour < 12 else 'PM'}"
 
 class TimeAnalyzer:
-    def __init__(self):
-        self.time_buckets = {
-            'early_morning': (5 ,9),
-            'midday': (9, 16),
-            'evening': (16, 21),
-            'late_night': (21, 5)
-        }
-    
+    """Time-of-day, day-of-week and velocity patterns for an account.
+
+    With vectorized=True (the default) time-of-day and day-of-week totals
+    come from the hour and weekday histograms the account keeps up to
+    date on every write, and spending velocity from the expense gap sums
+    kept alongside them, so they cost the same however long the history;
+    vectorized=False rebuilds them from the ledger with pure-Python loops.
+    Both paths produce the same insights.
+
+    `time_buckets` maps bucket names to (start, end) hours and defaults to
+    DEFAULT_TIME_BUCKETS. Buckets must not overlap; bucket totals are
+    folded from the 24 hourly bins.
+    """
+
+    def __init__(self, vectorized=True, time_buckets=None):
+        self.vectorized = vectorized
+        self.time_buckets = dict(DEFAULT_TIME_BUCKETS if time_buckets is None else time_buckets)
+        covered = set()
+        for name, (start, end) in self.time_buckets.items():
+            if not (0 <= start < 24 and 0 <= end <= 24) or start == end:
+                raise ValueError(f"Invalid hours for time bucket {name!r}: {start} - {end}")
+            hours = {hour for hour in range(24) if self._in_bucket(hour, start, end)}
+            if hours & covered:
+                raise ValueError(f"Time bucket {name!r} overlaps another bucket")
+            covered |= hours
+        self._hour_to_bucket = self.hour_to_bucket()
+
+    def bucket_label(self, bucket):
+        """Display name for a time bucket"""
+        if bucket in TIME_BUCKET_LABELS and self.time_buckets[bucket] == DEFAULT_TIME_BUCKETS.get(bucket):
+            return TIME_BUCKET_LABELS[bucket]
+        start, end = self.time_buckets[bucket]
+        return f"{bucket.replace('_', ' ').capitalize()} ({_hour_label(start)} - {_hour_label(end)})"
+
+    @timed('analyzer')
     def analyze_account_patterns(self, account):
         """Analyze time and day patterns for an account"""
-        if not account.transactions:
-            return None
-
-        transactions = [t for t in account.transactions if t.amount < 0] # Only expenses
+        ledger = account.ledger
+        if not len(ledger) or not account.stats.expenses.count:
+            return None  # Only expenses
+
+        if self.vectorized:
+            times = account.stats.times
+            hour_totals, hour_counts = times.hourly_spend.tolist(), times.hourly_counts.tolist()
+            day_totals = dict(enumerate(times.weekday_spend.tolist()))
+        else:
+            record_scan(len(ledger))
+            expenses = ledger.amounts < 0
+            hour_totals, hour_counts = self._hour_totals(ledger.amounts[expenses], ledger.hours[expenses])
+            day_totals = self._day_totals(ledger.amounts[expenses], ledger.weekdays[expenses])
 
-        if not transactions:
-            return None
-        
         insights = {}
 
-        # Time of day analysis 
-        time_insight = self._analyze_time_of_day(transactions)
+        # Time of day analysis
+        time_insight = self.time_of_day_insight(*self.bucket_totals(hour_totals, hour_counts))
         if time_insight:
-            insights['time_of_day'] = time_insight 
-        
+            insights['time_of_day'] = time_insight
+
         # Day of week analysis
-        day_insight = self._analyze_day_of_week(transactions)
+        day_insight = self.day_of_week_insight(day_totals)
         if day_insight:
             insights['day_of_week'] = day_insight
         
         # Spending velocity
-        velocity_insight = self._analyze_spending_velocity(transactions)
+        if self.vectorized:
+            velocity_insight = self.velocity_from_gaps(account)
+        else:
+            velocity_insight = self._analyze_spending_velocity(ledger.timestamps[expenses])
         if velocity_insight:
             insights['spending_velocity'] = velocity_insight
         
         return insights if insights else None
 
-    def _analyze_time_of_day(self, transactions):
-        time_totals = {bucket: 0 for bucket in self.time_buckets}
-        time_counts = {bucket: 0 for bucket in self.time_buckets}
-
-        for t in transactions:
-            hour = datetime.fromisoformat(t.date).hour
-            for bucket, (start, end) in self.time_buckets.items():
-                if start <= hour < end or (start > end and (hour >= start or hour < end)):
-                    time_totals[bucket] += abs(t.amount)
-                    time_counts[bucket] += 1
-
+    def _in_bucket(self, hour, start, end):
+        return start <= hour < end or (start > end and (hour >= start or hour < end))
+
+    def hour_to_bucket(self):
+        """Bucket index for each hour of the day (buckets don't overlap);
+        hours outside every bucket map to len(time_buckets)"""
+        hour_to_bucket = np.full(24, len(self.time_buckets), dtype=np.int64)
+        for index, (start, end) in enumerate(self.time_buckets.values()):
+            for hour in range(24):
+                if self._in_bucket(hour, start, end):
+                    hour_to_bucket[hour] = index
+        return hour_to_bucket
+
+    def _hour_totals(self, amounts, hours):
+        """Spend and count per hour of day, from ledger rows"""
+        hour_totals = [0.0] * 24
+        hour_counts = [0] * 24
+        for amount, hour in zip(amounts.tolist(), hours.tolist()):
+            hour_totals[hour] += abs(amount)
+            hour_counts[hour] += 1
+        return hour_totals, hour_counts
+
+    def _day_totals(self, amounts, weekdays):
+        day_totals = {day: 0.0 for day in range(7)}
+        for amount, day in zip(amounts.tolist(), weekdays.tolist()):
+            day_totals[day] += abs(amount)
+        return day_totals
+
+    def bucket_totals(self, hour_totals, hour_counts):
+        """Per-bucket spend totals and counts folded from 24 hourly bins"""
+        buckets = list(self.time_buckets)
+        time_totals = {bucket: 0.0 for bucket in buckets}
+        time_counts = {bucket: 0 for bucket in buckets}
+        for hour, index in enumerate(self._hour_to_bucket.tolist()):
+            if index < len(buckets):
+                time_totals[buckets[index]] += hour_totals[hour]
+                time_counts[buckets[index]] += hour_counts[hour]
+        return time_totals, time_counts
+
+    def time_of_day_insight(self, time_totals, time_counts):
+        """Dominant time bucket from per-bucket spend totals and counts"""
         # Find dominant time bucket
         if sum(time_totals.values()) > 0:
             dominant_bucket = max(time_totals, key=time_totals.get)
             percentage = (time_totals[dominant_bucket] / sum(time_totals.values())) * 100
             
             if percentage > 60: # Significant pattern
-                time_names = {
-                    'early_morning': 'Early morning (5 - 9 AM)',
-                    'midday': 'Midday (9 AM - 4 PM)',
-                    'evening': 'Evening (4 - 9 PM)',
-                    'late_night': 'Late night (9 PM - 5 AM)'
-                }
-
                 return {
-                    'dominant_period': time_names[dominant_bucket],
+                    'dominant_period': self.bucket_label(dominant_bucket),
                     'percentage': round(percentage, 1),
                     'average_amount': time_totals[dominant_bucket] / max(1, time_counts[dominant_bucket]),
                     'impact_score': min(0.9, percentage / 100)
@@ -73,14 +155,10 @@ class TimeAnalyzer:
             
             return None 
     
-    def _analyze_day_of_week(self, transactions):
-        day_totals = {day: 0 for day in range(7)}
+    def day_of_week_insight(self, day_totals):
+        """Weekend focus from spend totals per weekday (0 is Monday)"""
         day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
-        for t in transactions:
-            day = datetime.fromisoformat(t.date).weekday()
-            day_totals[day] += abs(t.amount)
-        
         # Calculate weekend vs weekday
         weekday_total = sum(day_totals[day] for day in range(5)) # Mon-Fri
         weekend_total = sum(day_totals[day] for day in range(5, 7)) # Sat- Sun
@@ -106,22 +184,39 @@ class TimeAnalyzer:
         
         return insights if insights else None 
     
-    def _analyze_spending_velocity(self, transactions):
-        if len(transactions) < 3:
+    def _analyze_spending_velocity(self, timestamps):
+        if len(timestamps) < 3:
             return None
 
-        # Sort by date and calculate intervals 
-        sorted_transactions = sorted(transactions, key=lambda x: x.date)
-        dates = [datetime.fromisoformat(t.date) for t in sorted_transactions]
+        # Sort by date and calculate intervals (in whole days)
+        timestamps = sorted(timestamps.tolist())
 
         intervals = []
-        for i in range(1, len(dates)):
-            interval = (dates[i] - dates[i-1]).days
+        for i in range(1, len(timestamps)):
+            interval = (timestamps[i] - timestamps[i-1]) // MICROS_PER_DAY
             intervals.append(interval)
 
         avg_interval = statistics.mean(intervals)
         interval_std = statistics.stdev(intervals) if len(intervals) > 1 else 0
+        return self.velocity_insight(avg_interval, interval_std)
+
+    def velocity_from_gaps(self, account):
+        """Velocity from the expense gap sums kept on the account's stats"""
+        if account.stats.expenses.count < 3:
+            return None
 
+        gaps = account.stats.gaps
+        if gaps.stale:
+            # Expenses arrived out of order: one pass over the index, which
+            # is already in date order
+            ledger = account.ledger
+            index = ledger.index
+            record_scan(len(index))
+            gaps.rebuild(index.timestamps[ledger.amounts[index.rows] < 0])
+        return self.velocity_insight(*self.interval_stats(*gaps.sums))
+
+    def velocity_insight(self, avg_interval, interval_std):
+        """Spending frequency from the mean and stdev of days between expenses"""
         consistency = 1 - (interval_std / avg_interval) if avg_interval > 0 else 0
 
         if avg_interval <= 2:
@@ -136,4 +231,12 @@ class TimeAnalyzer:
             'consistency': round(consistency, 2),
             'pattern': pattern,
             'message': f"{pattern.capitalize()} spending (every {avg_interval:.1f} days)"
-        }
\ No newline at end of file
+        }
+
+    def interval_stats(self, n, total, squares):
+        """Mean and sample stdev of n integer intervals from their sum and sum of squares"""
+        avg_interval = total / n
+        if n < 2:
+            return avg_interval, 0
+        variance = (n * squares - total * total) / (n * (n - 1))
+        return avg_interval, math.sqrt(variance)
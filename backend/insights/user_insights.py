@@ -0,0 +1,193 @@
+import numpy as np
+
+from instrumentation import timed, record_scan
+from insights.time_analyzer import TimeAnalyzer
+from models.timestamps import to_epoch, day_number
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Window the daily burn rate is averaged over
+BURN_RATE_DAYS = 30
+
+TOP_PATTERN_COUNT = 5
+
+UNCATEGORIZED = 'uncategorized'
+
+class UserInsights:
+    """Insights across all of a user's accounts from one pass over their expenses.
+
+    Expense rows from every ledger are gathered into flat arrays labelled
+    with their account, folder and category, and every breakdown is a
+    bincount over those labels. Per-account time patterns come from each
+    account's hour and weekday histograms and expense gaps, as in
+    TimeAnalyzer.analyze_account_patterns.
+    """
+
+    def __init__(self, time_analyzer=None):
+        self.time_analyzer = time_analyzer or TimeAnalyzer()
+
+    def _collect(self, accounts, folder_index):
+        """Flat expense columns for all accounts, plus category names"""
+        categories = {}
+        columns = {name: [] for name in ('spend', 'hours', 'weekdays', 'days', 'accounts', 'folders',
+                                         'categories')}
+        scanned = 0
+
+        for account_index, account in enumerate(accounts):
+            ledger = account.ledger
+            scanned += len(ledger)
+            expenses = ledger.amounts < 0
+            count = int(np.count_nonzero(expenses))
+            if not count:
+                continue
+
+            # Map this ledger's category codes onto user-wide codes
+            lookup = np.array([
+                categories.setdefault(name or UNCATEGORIZED, len(categories))
+                for name in ledger.categories
+            ], dtype=np.int64)
+
+            columns['spend'].append(-ledger.amounts[expenses])
+            columns['hours'].append(ledger.hours[expenses])
+            columns['weekdays'].append(ledger.weekdays[expenses])
+            columns['days'].append(ledger.days[expenses])
+            columns['categories'].append(lookup[ledger.category_codes[expenses]])
+            columns['accounts'].append(np.full(count, account_index, dtype=np.int64))
+            # -1 for an account whose folder is missing
+            columns['folders'].append(np.full(count, folder_index.get(account.folder_id, -1), dtype=np.int64))
+
+        record_scan(scanned)
+        if not columns['spend']:
+            return None, list(categories)
+        return {name: np.concatenate(parts) for name, parts in columns.items()}, list(categories)
+
+    def _breakdown(self, labels, size, rows, buckets):
+        """Spend per label, split by time bucket and by weekday"""
+        bucket_names = list(self.time_analyzer.time_buckets)
+        slots = len(bucket_names) + 1  # last slot: hours outside every bucket
+        totals = np.bincount(labels, weights=rows['spend'], minlength=size)
+        counts = np.bincount(labels, minlength=size)
+        by_bucket = np.bincount(labels * slots + buckets, weights=rows['spend'],
+                                minlength=size * slots).reshape(size, slots)
+        by_day = np.bincount(labels * 7 + rows['weekdays'], weights=rows['spend'],
+                             minlength=size * 7).reshape(size, 7)
+
+        return [
+            {
+                'total_spending': round(float(totals[i]), 2),
+                'transaction_count': int(counts[i]),
+                'time_of_day': {name: round(value, 2) for name, value in zip(bucket_names, by_bucket[i].tolist())},
+                'day_of_week': {name: round(value, 2) for name, value in zip(DAY_NAMES, by_day[i].tolist())}
+            }
+            for i in range(size)
+        ]
+
+    def _account_patterns(self, accounts, rows):
+        """TimeAnalyzer's time patterns for every account at once"""
+        analyzer = self.time_analyzer
+        size = len(accounts)
+        labels = rows['accounts']
+        counts = np.bincount(labels, minlength=size)
+
+        patterns = {}
+        for i, account in enumerate(accounts):
+            if not counts[i]:
+                patterns[account.id] = None
+                continue
+
+            insights = {}
+            times = account.stats.times
+            time_insight = analyzer.time_of_day_insight(
+                *analyzer.bucket_totals(times.hourly_spend.tolist(), times.hourly_counts.tolist()))
+            if time_insight:
+                insights['time_of_day'] = time_insight
+
+            day_insight = analyzer.day_of_week_insight(dict(enumerate(times.weekday_spend.tolist())))
+            if day_insight:
+                insights['day_of_week'] = day_insight
+
+            velocity_insight = analyzer.velocity_from_gaps(account)
+            if velocity_insight:
+                insights['spending_velocity'] = velocity_insight
+
+            patterns[account.id] = insights if insights else None
+        return patterns
+
+    def _top_patterns(self, rows, buckets, category_names, total_spending):
+        """Largest (category, weekday, time bucket) cells by spend"""
+        bucket_names = list(self.time_analyzer.time_buckets)
+        slots = len(bucket_names) + 1
+        cells = np.bincount((rows['categories'] * 7 + rows['weekdays']) * slots + buckets,
+                            weights=rows['spend'], minlength=len(category_names) * 7 * slots)
+
+        patterns = []
+        for cell in np.argsort(cells, kind='stable')[::-1]:
+            if len(patterns) == TOP_PATTERN_COUNT or cells[cell] <= 0:
+                break
+            category, rest = divmod(int(cell), 7 * slots)
+            day, bucket = divmod(rest, slots)
+            if bucket == len(bucket_names):
+                continue
+            percentage = cells[cell] / total_spending * 100
+            patterns.append({
+                'category': category_names[category],
+                'day': DAY_NAMES[day],
+                'period': bucket_names[bucket],
+                'total_spending': round(float(cells[cell]), 2),
+                'percentage': round(float(percentage), 1),
+                'message': f"{category_names[category].capitalize()} on {DAY_NAMES[day]} "
+                           f"{bucket_names[bucket].replace('_', ' ')}s: {percentage:.1f}% of spending"
+            })
+        return patterns
+
+    @timed('analyzer')
+    def analyze_user(self, user_data, now=None):
+        """User-wide breakdowns and per-account time patterns"""
+        accounts = list(user_data['accounts'].values())
+        folders = list(user_data['folders'].values())
+        folder_index = {folder.id: i for i, folder in enumerate(folders)}
+
+        rows, category_names = self._collect(accounts, folder_index)
+        if rows is None:
+            return {
+                'total_spending': 0.0,
+                'transaction_count': 0,
+                'daily_burn_rate': 0.0,
+                'average_daily_spending': 0.0,
+                'folders': [],
+                'categories': [],
+                'top_patterns': [],
+                'accounts': {account.id: None for account in accounts}
+            }
+
+        buckets = self.time_analyzer.hour_to_bucket()[rows['hours']]
+        total_spending = float(rows['spend'].sum())
+
+        today = day_number(to_epoch(now))
+        recent = (rows['days'] > today - BURN_RATE_DAYS) & (rows['days'] <= today)
+        days_covered = int(rows['days'].max() - rows['days'].min()) + 1
+
+        # Accounts without a folder count everywhere except the folder list;
+        # their rows go to a spare last slot that isn't reported
+        folder_labels = np.where(rows['folders'] < 0, len(folders), rows['folders'])
+        folder_breakdown = self._breakdown(folder_labels, len(folders) + 1, rows, buckets)[:len(folders)]
+        category_breakdown = self._breakdown(rows['categories'], len(category_names), rows, buckets)
+
+        return {
+            'total_spending': round(total_spending, 2),
+            'transaction_count': len(rows['spend']),
+            'daily_burn_rate': round(float(rows['spend'][recent].sum()) / BURN_RATE_DAYS, 2),
+            'average_daily_spending': round(total_spending / days_covered, 2),
+            'folders': [
+                {'id': folder.id, 'name': folder.name, **breakdown}
+                for folder, breakdown in zip(folders, folder_breakdown)
+                if breakdown['transaction_count']
+            ],
+            'categories': sorted(
+                ({'name': name, **breakdown} for name, breakdown in zip(category_names, category_breakdown)
+                 if breakdown['transaction_count']),
+                key=lambda category: -category['total_spending']
+            ),
+            'top_patterns': self._top_patterns(rows, buckets, category_names, total_spending),
+            'accounts': self._account_patterns(accounts, rows)
+        }
@@ -0,0 +1,185 @@
+"""Timing, scan counting and opt-in profiling.
+
+Set PENNYPINCHER_METRICS=0 to turn instrumentation off: decorators then
+return the original functions and no request hooks are installed, so the
+disabled cost is nothing at all. Per-request profiling additionally needs
+PENNYPINCHER_PROFILING=1 and is triggered by ?profile=1 or an
+`X-Profile: 1` header.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+ENABLED = os.environ.get('PENNYPINCHER_METRICS', '1') != '0'
+PROFILING_ALLOWED = os.environ.get('PENNYPINCHER_PROFILING', '0') == '1'
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Rows scanned during the current request, if one is being tracked
+_scanned = ContextVar('scanned', default=None)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.total += seconds
+        self.count += 1
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Metrics:
+    """Process-wide latency histograms and counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = {}  # (kind, name) -> Histogram
+        self.requests = {}  # (route, status) -> count
+        self.scanned = {}  # route -> transactions scanned
+
+    def observe(self, kind, name, seconds):
+        with self._lock:
+            histogram = self.durations.get((kind, name))
+            if histogram is None:
+                histogram = self.durations[(kind, name)] = Histogram()
+            histogram.observe(seconds)
+
+    def count_request(self, route, status, scanned):
+        with self._lock:
+            self.requests[(route, status)] = self.requests.get((route, status), 0) + 1
+            self.scanned[route] = self.scanned.get(route, 0) + scanned
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP pennypincher_duration_seconds Time spent in instrumented code.",
+            "# TYPE pennypincher_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (kind, name), histogram in sorted(self.durations.items()):
+                labels = f'kind="{kind}",name="{name}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'pennypincher_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'pennypincher_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'pennypincher_duration_seconds_sum{{{labels}}} {histogram.total}')
+                lines.append(f'pennypincher_duration_seconds_count{{{labels}}} {histogram.count}')
+
+            lines += [
+                "# HELP pennypincher_requests_total Requests handled, by route and status.",
+                "# TYPE pennypincher_requests_total counter",
+            ]
+            for (route, status), count in sorted(self.requests.items()):
+                lines.append(f'pennypincher_requests_total{{route="{route}",status="{status}"}} {count}')
+
+            lines += [
+                "# HELP pennypincher_transactions_scanned_total Transactions read while serving a route.",
+                "# TYPE pennypincher_transactions_scanned_total counter",
+            ]
+            for route, count in sorted(self.scanned.items()):
+                lines.append(f'pennypincher_transactions_scanned_total{{route="{route}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def timer(kind, name):
+    """Time a block into the (kind, name) histogram"""
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(kind, name, time.perf_counter() - started)
+
+
+def timed(kind, name=None):
+    """Decorator form of timer(); a no-op when instrumentation is disabled"""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.observe(kind, label, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def record_scan(count):
+    """Count transactions read on behalf of the current request"""
+    scanned = _scanned.get()
+    if scanned is not None:
+        scanned[0] += count
+
+
+def init_app(app):
+    """Install request timing, JSON encode timing, profiling and the /metrics endpoint"""
+    from flask import Response, g, request
+
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    if not ENABLED:
+        return
+
+    class TimedJSONProvider(type(app.json)):
+        def dumps(self, obj, **kwargs):
+            with timer('serialize', 'json'):
+                return super().dumps(obj, **kwargs)
+
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_request():
+        g.instrumentation_started = time.perf_counter()
+        g.instrumentation_scan_token = _scanned.set([0])
+        if PROFILING_ALLOWED and (request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def _finish_request(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(40)
+            response = Response(output.getvalue(), mimetype='text/plain')
+
+        started = g.pop('instrumentation_started', None)
+        token = g.pop('instrumentation_scan_token', None)
+        if started is not None and token is not None:
+            route = request.endpoint or 'unmatched'
+            scanned = _scanned.get()[0]
+            _scanned.reset(token)
+            metrics.observe('route', route, time.perf_counter() - started)
+            metrics.count_request(route, response.status_code, scanned)
+        return response
@@ -1,6 +1,13 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from enum import Enum
 
+import numpy as np
+
+from instrumentation import timed, record_scan
+from models.account_stats import AccountStats
+from models.ledger import Ledger
+from models.timestamps import to_epoch, day_number, MICROS_PER_DAY
+
 class AccountType(Enum):
     CHECKING = "checking"
     BILL = "bill"
@@ -15,23 +22,94 @@ class Account:
                  current_balance=0):
         self.id = account_id
         self.name = name
-        self.type = account_type
+        self.type = AccountType(account_type)
         self.folder_id = folder_id
         self.monthly_budget = float(monthly_budget)
         self.target_amount = float(target_amount)
         self.deadline = deadline
+        self.opening_balance = float(current_balance)
         self.current_balance = float(current_balance)
         self.created_at = datetime.now().isoformat()
-        self.transactions = []
+        self.ledger = Ledger()
+        self.stats = AccountStats()
+        self.version = 0  # bumped on every change to the ledger
+
+    @property
+    def transactions(self):
+        """Transaction views built from the ledger (for serialization)"""
+        return self.ledger.transactions()
 
     def add_transaction(self, transaction):
-        self.transactions.append(transaction)
+        self.ledger.append(transaction)
+        self.stats.add(transaction.amount, transaction.timestamp)
+        self.version += 1
         # Update balance based on transaction type
         if transaction.amount < 0: # Expense
             self.current_balance += transaction.amount
         else: # Income or transfer in
             self.current_balance += transaction.amount
     
+    def window_totals(self, since, income=False):
+        """Total, first and last timestamp of expenses (or income) dated on/after `since`.
+
+        Expenses are totalled as positive amounts. Returns (0.0, None, None)
+        when nothing falls in the window.
+        """
+        running = self.stats.income if income else self.stats.expenses
+        if not running.count or running.max_timestamp < since:
+            return 0.0, None, None
+        if running.min_timestamp >= since:
+            # Whole history is inside the window
+            return running.total, running.min_timestamp, running.max_timestamp
+
+        # Whole days after the cutoff come from the daily index; only rows
+        # dated on the cutoff day itself are read from the ledger
+        daily = self.stats.daily
+        since_day = day_number(since)
+        partial, first = self._day_totals(since_day, since, income)
+        if first is None:
+            first_day = daily.first_active_day(since_day + 1, income)
+            _, first = self._day_totals(first_day, first_day * MICROS_PER_DAY, income)
+        return partial + daily.total(since_day + 1, income=income), first, running.max_timestamp
+
+    def _day_totals(self, day, since, income):
+        """Total and earliest timestamp of expenses (or income) on `day`, at or after `since`"""
+        index = self.ledger.index
+        timestamps = index.timestamps
+        start = int(np.searchsorted(timestamps, since, 'left'))
+        end = int(np.searchsorted(timestamps, (day + 1) * MICROS_PER_DAY, 'left'))
+        record_scan(end - start)
+
+        amounts = self.ledger.amounts[index.rows[start:end]]
+        matches = (amounts > 0) if income else (amounts < 0)
+        if not matches.any():
+            return 0.0, None
+        return float(abs(amounts[matches]).sum()), int(timestamps[start:end][matches][0])
+
+    def add_transactions(self, transactions):
+        """Add a batch of transactions (e.g. from a bulk import)"""
+        self.ledger.extend(transactions)
+        for transaction in transactions:
+            self.stats.add(transaction.amount, transaction.timestamp)
+            self.current_balance += transaction.amount
+        self.version += 1
+
+    def add_columns(self, ids, amounts, timestamps, created_timestamps, category_codes,
+                    categories, descriptions):
+        """Add transactions given column-wise, as NumPy arrays (e.g. from a snapshot)"""
+        self.ledger.extend_columns(ids, amounts, timestamps, created_timestamps, self.id,
+                                   category_codes, categories, descriptions)
+        self.stats.add_many(amounts, timestamps)
+        self.current_balance += float(amounts.sum())
+        self.version += 1
+
+    def attach_ledger(self, ledger):
+        """Take over a prebuilt ledger (e.g. from Ledger.from_columns) for an account with no transactions yet"""
+        self.ledger = ledger
+        self.stats.add_many(ledger.amounts, ledger.timestamps)
+        self.current_balance += float(ledger.amounts.sum())
+        self.version += 1
+
     def get_budget_utilization(self):
         if self.monthly_budget == 0:
             return 0
@@ -39,18 +117,13 @@ class Account:
         return (monthly_spending / self.monthly_budget) * 100
     
     def get_monthly_spending(self):
-        """Calculate spending for current month"""
+        """Calculate spending for current month (and any future-dated days)"""
         now = datetime.now()
-        current_month_start = datetime(now.year, now.month, 1)
-        monthly_transactions = [
-            t for t in self.transactions 
-            if t.amount < 0 and datetime.fromisoformat(t.date) >= current_month_start
-        ]
-
-        return abs(sum(t.amount for t in monthly_transactions))
+        return self.stats.daily.total(day_number(to_epoch(datetime(now.year, now.month, 1))))
     
-    def get_health_status(self):
-        utilization = self.get_budget_utilization()
+    def get_health_status(self, utilization=None):
+        if utilization is None:
+            utilization = self.get_budget_utilization()
         if utilization > 100:
             return "over_budget"
         elif utilization > 80:
@@ -58,8 +131,10 @@ class Account:
         else:
             return "healthy"
     
-    def to_dict(self):
-        return {
+    @timed('serialize')
+    def to_dict(self, fields=None):
+        utilization = self.get_budget_utilization()
+        data = {
             'id': self.id,
             'name': self.name,
             'type': self.type,
@@ -68,7 +143,10 @@ class Account:
             'target_amount': self.target_amount,
             'deadline': self.deadline,
             'current_balance': self.current_balance,
-            'budget_utilization': self.get_budget_utilization(),
-            'health_status': self.get_health_status(),
-            'transaction_count': len(self.transactions)
-        }
\ No newline at end of file
+            'budget_utilization': utilization,
+            'health_status': self.get_health_status(utilization),
+            'transaction_count': self.stats.count
+        }
+        if fields is not None:
+            data = {field: data[field] for field in fields if field in data}
+        return data
\ No newline at end of file
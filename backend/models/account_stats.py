@@ -0,0 +1,395 @@
+import math
+
+import numpy as np
+
+from models.timestamps import MICROS_PER_DAY, hour_of_day, weekday
+
+class RunningTotals:
+    """Count, total, date range and spread of a stream of amounts.
+
+    Mean and variance are kept with Welford's method, which stays accurate
+    where a plain sum-of-squares would lose precision.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min_timestamp = None
+        self.max_timestamp = None
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, amount, timestamp):
+        self.count += 1
+        self.total += amount
+
+        delta = amount - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (amount - self.mean)
+
+        if self.min_timestamp is None or timestamp < self.min_timestamp:
+            self.min_timestamp = timestamp
+        if self.max_timestamp is None or timestamp > self.max_timestamp:
+            self.max_timestamp = timestamp
+
+    def add_many(self, amounts, timestamps):
+        """Add arrays of amounts at once (Chan's parallel update of mean and M2)"""
+        count = len(amounts)
+        if not count:
+            return
+        mean = float(amounts.mean())
+        m2 = float(((amounts - mean) ** 2).sum())
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.total += float(amounts.sum())
+
+        low, high = int(timestamps.min()), int(timestamps.max())
+        if self.min_timestamp is None or low < self.min_timestamp:
+            self.min_timestamp = low
+        if self.max_timestamp is None or high > self.max_timestamp:
+            self.max_timestamp = high
+
+    def remove(self, amount, timestamp, bounds=None):
+        """Take back an amount added earlier (e.g. a corrected transaction).
+
+        Totals and spread are exact. The date range can't be narrowed from
+        the totals alone, so when `timestamp` is the first or last one,
+        `bounds` must give the (first, last) timestamps of what remains.
+        """
+        if not self.count:
+            raise ValueError("Nothing to remove")
+        if bounds is None and self.count > 1 and timestamp in (self.min_timestamp, self.max_timestamp):
+            raise ValueError("Removing the first or last amount needs the remaining bounds")
+        self.count -= 1
+        self.total -= amount
+        if not self.count:
+            self.total = self.mean = self._m2 = 0.0
+            self.min_timestamp = self.max_timestamp = None
+            return
+
+        # Welford's update run backwards
+        mean = self.mean
+        self.mean = (mean * (self.count + 1) - amount) / self.count
+        self._m2 = max(0.0, self._m2 - (amount - self.mean) * (amount - mean))
+
+        if bounds is not None:
+            self.min_timestamp, self.max_timestamp = bounds
+
+    def stdev(self):
+        """Sample standard deviation (like statistics.stdev)"""
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(max(0.0, self._m2) / (self.count - 1))
+
+
+class DailyTotals:
+    """Spending and income per calendar day, with prefix sums for range queries.
+
+    Days are whole days since the epoch; the covered range starts at
+    `first_day` and may begin with empty days. Adding an amount is
+    amortized O(1), in date order or not; the prefix sums are brought up to
+    date lazily from the earliest day that changed, so appends in date
+    order only touch the newest days. Totals
+    over any day range are then O(1), and finding the next day with
+    activity is O(log n).
+    """
+
+    _COLUMNS = {
+        'spending': np.float64,
+        'income': np.float64,
+        'spending_counts': np.int64,
+        'income_counts': np.int64,
+    }
+
+    def __init__(self, capacity=32):
+        self.first_day = None
+        self._days = 0  # days covered, starting at first_day
+        self._values = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self._COLUMNS.items()}
+        # prefix[i] is the sum of values[:i]; valid up to index _clean
+        self._prefix = {name: np.zeros(capacity + 1, dtype=dtype) for name, dtype in self._COLUMNS.items()}
+        self._clean = 0
+
+    def __len__(self):
+        return self._days
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self._values.values()) + \
+            sum(prefix.nbytes for prefix in self._prefix.values())
+
+    def _resize(self, capacity, shift=0):
+        """Reallocate to `capacity` days, moving existing days `shift` places later"""
+        for name, old in self._values.items():
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[shift:shift + self._days] = old[:self._days]
+            self._values[name] = new
+            prefix = np.zeros(capacity + 1, dtype=old.dtype)
+            prefix[:self._clean + 1] = self._prefix[name][:self._clean + 1]
+            self._prefix[name] = prefix
+
+    def _cover(self, day):
+        """Index of `day`, extending the covered range to include it"""
+        if self.first_day is None:
+            self.first_day = day
+        if day < self.first_day:
+            # Back-dated before everything so far: move all days along, with
+            # at least as many spare days in front as are covered, so a run
+            # of back-dated days costs amortized O(1) each
+            shift = max(self.first_day - day, self._days)
+            capacity = len(self._values['spending'])
+            while capacity < self._days + shift:
+                capacity *= 2
+            self._clean = 0
+            self._resize(capacity, shift)
+            self.first_day -= shift
+            self._days += shift
+
+        index = day - self.first_day
+        if index >= self._days:
+            capacity = len(self._values['spending'])
+            if index >= capacity:
+                while capacity <= index:
+                    capacity *= 2
+                self._resize(capacity)
+            self._days = index + 1
+        return index
+
+    def add(self, amount, timestamp, sign=1):
+        if amount == 0:
+            return
+        index = self._cover(timestamp // MICROS_PER_DAY)
+        if amount < 0:
+            self._values['spending'][index] -= sign * amount
+            self._values['spending_counts'][index] += sign
+        else:
+            self._values['income'][index] += sign * amount
+            self._values['income_counts'][index] += sign
+        self._clean = min(self._clean, index)
+
+    def remove(self, amount, timestamp):
+        """Take back an amount added earlier; the covered days stay as they are"""
+        self.add(amount, timestamp, sign=-1)
+
+    def add_many(self, amounts, timestamps):
+        """Add arrays of amounts at once"""
+        nonzero = amounts != 0
+        amounts = amounts[nonzero]
+        if not len(amounts):
+            return
+        days = timestamps[nonzero] // MICROS_PER_DAY
+        self._cover(int(days.min()))
+        self._cover(int(days.max()))
+        indexes = days - self.first_day
+
+        spending = amounts < 0
+        for name, rows, weights in (('spending', spending, -amounts[spending]),
+                                    ('income', ~spending, amounts[~spending])):
+            totals = np.bincount(indexes[rows], weights=weights, minlength=self._days)
+            counts = np.bincount(indexes[rows], minlength=self._days)
+            self._values[name][:self._days] += totals
+            self._values[name + '_counts'][:self._days] += counts
+        self._clean = min(self._clean, int(indexes.min()))
+
+    def _prefixes(self):
+        if self._clean < self._days:
+            start = self._clean
+            for name, values in self._values.items():
+                prefix = self._prefix[name]
+                prefix[start + 1:self._days + 1] = prefix[start] + np.cumsum(values[start:self._days])
+            self._clean = self._days
+        return self._prefix
+
+    def _span(self, first_day, last_day):
+        """Index range [start, end) for an inclusive day range; None bounds are open"""
+        if self.first_day is None:
+            return 0, 0
+        start = 0 if first_day is None else min(max(first_day - self.first_day, 0), self._days)
+        end = self._days if last_day is None else min(max(last_day - self.first_day + 1, 0), self._days)
+        return start, max(start, end)
+
+    def total(self, first_day=None, last_day=None, income=False):
+        """Spending (or income) on days first_day..last_day inclusive"""
+        start, end = self._span(first_day, last_day)
+        prefix = self._prefixes()['income' if income else 'spending']
+        return float(prefix[end] - prefix[start])
+
+    def count(self, first_day=None, last_day=None, income=False):
+        """Number of expenses (or income transactions) on days first_day..last_day"""
+        start, end = self._span(first_day, last_day)
+        prefix = self._prefixes()['income_counts' if income else 'spending_counts']
+        return int(prefix[end] - prefix[start])
+
+    def first_active_day(self, day, income=False):
+        """First day on or after `day` with any spending (or income), or None"""
+        start, _ = self._span(day, None)
+        prefix = self._prefixes()['income_counts' if income else 'spending_counts'][:self._days + 1]
+        position = int(np.searchsorted(prefix, prefix[start], 'right'))
+        return None if position > self._days else self.first_day + position - 1
+
+    def series(self, first_day, last_day, income=False):
+        """Zero-filled per-day spending (or income) for days first_day..last_day"""
+        result = np.zeros(max(0, last_day - first_day + 1))
+        start, end = self._span(first_day, last_day)
+        if end > start:
+            offset = self.first_day + start - first_day
+            result[offset:offset + end - start] = self._values['income' if income else 'spending'][start:end]
+        return result
+
+
+class TimeHistograms:
+    """Spending and expense counts by hour of day (24 bins) and weekday (7 bins).
+
+    Kept up to date on every write, so time-of-day and day-of-week
+    patterns never need the ledger. Weekday 0 is Monday.
+    """
+
+    def __init__(self):
+        self.hourly_spend = np.zeros(24)
+        self.hourly_counts = np.zeros(24, dtype=np.int64)
+        self.weekday_spend = np.zeros(7)
+        self.weekday_counts = np.zeros(7, dtype=np.int64)
+
+    def add(self, spend, timestamp):
+        hour, day = hour_of_day(timestamp), weekday(timestamp)
+        self.hourly_spend[hour] += spend
+        self.hourly_counts[hour] += 1
+        self.weekday_spend[day] += spend
+        self.weekday_counts[day] += 1
+
+    def remove(self, spend, timestamp):
+        hour, day = hour_of_day(timestamp), weekday(timestamp)
+        for totals, counts, key in ((self.hourly_spend, self.hourly_counts, hour),
+                                    (self.weekday_spend, self.weekday_counts, day)):
+            counts[key] -= 1
+            # Don't leave rounding residue in an emptied bin
+            totals[key] = totals[key] - spend if counts[key] else 0.0
+
+    def add_many(self, spend, timestamps):
+        """Add arrays of spend amounts at once"""
+        if not len(spend):
+            return
+        hours, days = hour_of_day(timestamps), weekday(timestamps)
+        self.hourly_spend += np.bincount(hours, weights=spend, minlength=24)
+        self.hourly_counts += np.bincount(hours, minlength=24)
+        self.weekday_spend += np.bincount(days, weights=spend, minlength=7)
+        self.weekday_counts += np.bincount(days, minlength=7)
+
+
+class ExpenseGaps:
+    """Whole-day gaps between consecutive expenses: their count, sum and sum of squares.
+
+    An expense dated on or after every earlier one (the usual case) extends
+    the sums in O(1). Anything else marks them stale, and the next reader
+    rebuilds them once from the ledger's sorted index.
+    """
+
+    def __init__(self):
+        # (count, total, squares, last timestamp), replaced as a whole so
+        # concurrent readers never see a half-updated set
+        self._sums = (0, 0, 0, None)
+        self.stale = False
+
+    @property
+    def sums(self):
+        """(count, total, squares) of the gaps"""
+        return self._sums[:3]
+
+    def add(self, timestamp):
+        if self.stale:
+            return
+        count, total, squares, last = self._sums
+        if last is None:
+            self._sums = (0, 0, 0, timestamp)
+        elif timestamp < last:
+            self.stale = True
+        else:
+            gap = (timestamp - last) // MICROS_PER_DAY
+            self._sums = (count + 1, total + gap, squares + gap * gap, timestamp)
+
+    def add_many(self, timestamps):
+        """Add expense timestamps at once; stale unless they follow on in order"""
+        if self.stale or not len(timestamps):
+            return
+        last = self._sums[3]
+        if (last is not None and timestamps[0] < last) or (np.diff(timestamps) < 0).any():
+            self.stale = True
+            return
+        if last is not None:
+            timestamps = np.concatenate(([last], timestamps))
+        self._merge(timestamps)
+
+    def rebuild(self, timestamps):
+        """Recompute from every expense timestamp, in sorted order"""
+        self._sums = (0, 0, 0, None)
+        if len(timestamps):
+            self._merge(timestamps)
+        self.stale = False
+
+    def _merge(self, timestamps):
+        # Gaps are whole days, so exact integer sums
+        gaps = np.diff(timestamps) // MICROS_PER_DAY
+        count, total, squares, _ = self._sums
+        self._sums = (count + len(gaps), total + int(gaps.sum()), squares + int(np.dot(gaps, gaps)),
+                      int(timestamps[-1]))
+
+
+class AccountStats:
+    """Running aggregates over an account's transactions.
+
+    Updated by Account.add_transaction (and remove() for corrections) so
+    serialization and the insights engines can answer totals without
+    rescanning the ledger. Spending is stored as positive amounts. `daily` answers date-range totals for
+    budgets, projections and goals; `times` holds the hour and weekday
+    spending histograms and `gaps` the spacing of expenses for the time
+    analyzer.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.expenses = RunningTotals()
+        self.income = RunningTotals()
+        self.daily = DailyTotals()
+        self.times = TimeHistograms()
+        self.gaps = ExpenseGaps()
+
+    def add(self, amount, timestamp):
+        self.count += 1
+        if amount == 0:
+            return
+
+        self.daily.add(amount, timestamp)
+        if amount < 0:
+            self.expenses.add(-amount, timestamp)
+            self.times.add(-amount, timestamp)
+            self.gaps.add(timestamp)
+        else:
+            self.income.add(amount, timestamp)
+
+    def remove(self, amount, timestamp, bounds=None):
+        """Undo add() for a transaction that was deleted or is being corrected.
+
+        A correction is remove() of the old amount and date, then add() of
+        the new ones. `bounds` is passed on to the expense (or income)
+        RunningTotals.remove.
+        """
+        if amount < 0:
+            self.expenses.remove(-amount, timestamp, bounds)
+            self.times.remove(-amount, timestamp)
+            self.gaps.stale = True
+        elif amount > 0:
+            self.income.remove(amount, timestamp, bounds)
+        self.daily.remove(amount, timestamp)
+        self.count -= 1
+
+    def add_many(self, amounts, timestamps):
+        """Add arrays of amounts at once (e.g. when loading a snapshot)"""
+        self.count += len(amounts)
+        self.daily.add_many(amounts, timestamps)
+        expenses, income = amounts < 0, amounts > 0
+        self.expenses.add_many(-amounts[expenses], timestamps[expenses])
+        self.times.add_many(-amounts[expenses], timestamps[expenses])
+        self.gaps.add_many(timestamps[expenses])
+        self.income.add_many(amounts[income], timestamps[income])
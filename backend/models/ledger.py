@@ -0,0 +1,358 @@
+import numpy as np
+
+from instrumentation import timed
+from models.timestamps import hour_of_day, weekday, day_number
+from models.transaction import Transaction
+
+class SortedIndex:
+    """Ledger row numbers kept ordered by (timestamp, id).
+
+    Transactions mostly arrive in date order, so an insert is usually an
+    amortized O(1) append; back-dated rows shift the tail along. Batches
+    go through extend(), which sorts them once instead.
+    """
+
+    def __init__(self, capacity=16):
+        self._size = 0
+        self._rows = np.empty(capacity, dtype=np.int64)
+        self._timestamps = np.empty(capacity, dtype=np.int64)
+        self._ids = np.empty(capacity, dtype=np.int64)
+
+    @classmethod
+    def from_sorted(cls, rows, timestamps, transaction_ids):
+        """An index over columns already in (timestamp, id) order, used without copying"""
+        index = cls(capacity=1)
+        if len(rows):
+            index._rows, index._timestamps, index._ids = rows, timestamps, transaction_ids
+            index._size = len(rows)
+        return index
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return self._rows.nbytes + self._timestamps.nbytes + self._ids.nbytes
+
+    def _grow(self):
+        capacity = len(self._rows) * 2
+        for name in ('_rows', '_timestamps', '_ids'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def add(self, row, timestamp, transaction_id):
+        if self._size == len(self._rows):
+            self._grow()
+
+        size = self._size
+        if size and (timestamp, transaction_id) < (self._timestamps[size - 1], self._ids[size - 1]):
+            # Out of order: find the slot and shift everything after it
+            position = self.position(timestamp, transaction_id)
+            for column in (self._rows, self._timestamps, self._ids):
+                column[position + 1:size + 1] = column[position:size]
+        else:
+            position = size
+
+        self._rows[position] = row
+        self._timestamps[position] = timestamp
+        self._ids[position] = transaction_id
+        self._size += 1
+
+    def extend(self, rows, timestamps, transaction_ids):
+        """Add many rows at once.
+
+        The batch is sorted on its own, then merged with only the part of
+        the index that sorts after its first key, so a batch in any order
+        costs one sort rather than a shift per row.
+        """
+        count = len(rows)
+        if not count:
+            return
+        order = np.lexsort((transaction_ids, timestamps))
+        rows, timestamps, transaction_ids = (np.asarray(column)[order]
+                                             for column in (rows, timestamps, transaction_ids))
+
+        size = self._size
+        end = size + count
+        while end > len(self._rows):
+            self._grow()
+        start = size
+        if size and (timestamps[0], transaction_ids[0]) < (self._timestamps[size - 1], self._ids[size - 1]):
+            start = self.position(timestamps[0], transaction_ids[0])
+        columns = ((self._rows, rows), (self._timestamps, timestamps), (self._ids, transaction_ids))
+        for column, values in columns:
+            column[size:end] = values
+        if start < size:
+            merged = np.lexsort((self._ids[start:end], self._timestamps[start:end]))
+            for column, _ in columns:
+                column[start:end] = column[start:end][merged]
+        self._size = end
+
+    def position(self, timestamp, transaction_id, after=False):
+        """First position whose key is >= (timestamp, id); or > with after=True"""
+        timestamps = self.timestamps
+        start = int(np.searchsorted(timestamps, timestamp, 'left'))
+        end = int(np.searchsorted(timestamps, timestamp, 'right'))
+        side = 'right' if after else 'left'
+        return start + int(np.searchsorted(self._ids[start:end], transaction_id, side))
+
+    @property
+    def rows(self):
+        return self._rows[:self._size]
+
+    @property
+    def timestamps(self):
+        return self._timestamps[:self._size]
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+
+class Ledger:
+    """Columnar, append-only store of an account's transactions.
+
+    Every field lives in its own NumPy array (parallel by row). Arrays grow
+    geometrically so appends are amortized O(1), and categories are interned
+    to small integer codes.
+    """
+
+    INITIAL_CAPACITY = 16
+
+    # Rough size of a description string plus its list slot
+    DESCRIPTION_BYTES = 64
+
+    # Fixed-width columns and their dtypes
+    _COLUMNS = {
+        '_ids': np.int64,
+        '_amounts': np.float64,
+        '_timestamps': np.int64,
+        '_created_timestamps': np.int64,
+        '_account_ids': np.int64,
+        '_category_codes': np.int32,
+    }
+
+    # Keys derived from the timestamp column, computed lazily and cached
+    _DERIVED = {
+        'hours': hour_of_day,
+        'weekdays': weekday,
+        'days': day_number,
+    }
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._size = 0
+        for name, dtype in self._COLUMNS.items():
+            setattr(self, name, np.empty(max(1, capacity), dtype=dtype))
+        self.descriptions = []
+        self.categories = []  # code -> category name
+        self._category_lookup = {}  # category name -> code
+        self._derived = {}  # name -> (buffer, rows computed)
+        self.index = SortedIndex()
+
+    @classmethod
+    def from_columns(cls, ids, amounts, timestamps, created_timestamps, account_id,
+                     category_codes, categories, descriptions):
+        """A ledger over existing columns (e.g. memory-mapped from an export).
+
+        Rows must be in (timestamp, id) order. The arrays are used as they
+        are, not copied; the first append moves them into new, writable
+        arrays. `descriptions` can be any sequence with append and extend.
+        """
+        ledger = cls(capacity=1)
+        size = len(ids)
+        ledger.categories = list(categories)
+        ledger._category_lookup = {name: code for code, name in enumerate(ledger.categories)}
+        if size:
+            ledger._ids = ids
+            ledger._amounts = amounts
+            ledger._timestamps = timestamps
+            ledger._created_timestamps = created_timestamps
+            ledger._account_ids = np.broadcast_to(np.int64(account_id), (size,))
+            ledger._category_codes = category_codes
+            ledger.descriptions = descriptions
+            ledger._size = size
+            ledger.index = SortedIndex.from_sorted(np.arange(size), timestamps, ids)
+        return ledger
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        """Approximate memory held: allocated columns, index, derived keys and descriptions"""
+        return (sum(getattr(self, name).nbytes for name in self._COLUMNS)
+                + sum(buffer.nbytes for buffer, _ in self._derived.values())
+                + self.index.nbytes
+                + len(self.descriptions) * self.DESCRIPTION_BYTES)
+
+    def _reserve(self, extra):
+        """Make room for `extra` more rows, doubling capacity as needed"""
+        needed = self._size + extra
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+
+        while capacity < needed:
+            capacity *= 2
+
+        for name in self._COLUMNS:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def intern_category(self, category):
+        """Return the integer code for a category, registering it if new"""
+        code = self._category_lookup.get(category)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(category)
+            self._category_lookup[category] = code
+        return code
+
+    def append(self, transaction):
+        """Append a transaction and return its row index"""
+        self._reserve(1)
+        row = self._size
+        self._ids[row] = transaction.id
+        self._amounts[row] = transaction.amount
+        self._timestamps[row] = transaction.timestamp
+        self._created_timestamps[row] = transaction.created_timestamp
+        self._account_ids[row] = transaction.account_id
+        self._category_codes[row] = self.intern_category(transaction.category)
+        self.descriptions.append(transaction.description)
+        self._size += 1
+        self.index.add(row, transaction.timestamp, transaction.id)
+        return row
+
+    def extend(self, transactions):
+        """Append a batch of transactions: the columns are filled in bulk and
+        the index takes the whole batch in one merge"""
+        count = len(transactions)
+        if not count:
+            return
+        self._reserve(count)
+        start, end = self._size, self._size + count
+        self._ids[start:end] = [transaction.id for transaction in transactions]
+        self._amounts[start:end] = [transaction.amount for transaction in transactions]
+        self._timestamps[start:end] = [transaction.timestamp for transaction in transactions]
+        self._created_timestamps[start:end] = [transaction.created_timestamp for transaction in transactions]
+        self._account_ids[start:end] = [transaction.account_id for transaction in transactions]
+        self._category_codes[start:end] = [self.intern_category(transaction.category)
+                                           for transaction in transactions]
+        self.descriptions.extend(transaction.description for transaction in transactions)
+        self._size = end
+        self.index.extend(np.arange(start, end), self._timestamps[start:end], self._ids[start:end])
+
+    def extend_columns(self, ids, amounts, timestamps, created_timestamps, account_id,
+                       category_codes, categories, descriptions):
+        """Append rows given column-wise (e.g. from a snapshot) without building
+        Transaction objects; `category_codes` index into `categories`"""
+        count = len(ids)
+        self._reserve(count)
+        start, end = self._size, self._size + count
+        self._ids[start:end] = ids
+        self._amounts[start:end] = amounts
+        self._timestamps[start:end] = timestamps
+        self._created_timestamps[start:end] = created_timestamps
+        self._account_ids[start:end] = account_id
+        lookup = np.array([self.intern_category(category) for category in categories], dtype=np.int32)
+        self._category_codes[start:end] = lookup[category_codes] if len(lookup) else category_codes
+        self.descriptions.extend(descriptions)
+        self._size = end
+        self.index.extend(np.arange(start, end), self._timestamps[start:end], self._ids[start:end])
+
+    # Column views (only the filled part of each array)
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+    @property
+    def amounts(self):
+        return self._amounts[:self._size]
+
+    @property
+    def timestamps(self):
+        return self._timestamps[:self._size]
+
+    @property
+    def created_timestamps(self):
+        return self._created_timestamps[:self._size]
+
+    @property
+    def account_ids(self):
+        return self._account_ids[:self._size]
+
+    @property
+    def category_codes(self):
+        return self._category_codes[:self._size]
+
+    def category_code(self, category):
+        """Code of an existing category, or None"""
+        return self._category_lookup.get(category)
+
+    def derived(self, name):
+        """Return a derived key column, only computing rows added since last call.
+
+        The cache grows by doubling, like the columns, so keeping it up to
+        date after appends is amortized O(1) per row.
+        """
+        buffer, done = self._derived.get(name, (None, 0))
+        if buffer is None or done < self._size:
+            tail = self._DERIVED[name](self._timestamps[done:self._size])
+            if buffer is None or len(buffer) < self._size:
+                capacity = max(self._size, 2 * len(buffer) if buffer is not None else 0)
+                grown = np.empty(capacity, dtype=tail.dtype)
+                if done:
+                    grown[:done] = buffer[:done]
+                buffer = grown
+            buffer[done:self._size] = tail
+            self._derived[name] = (buffer, self._size)
+        return buffer[:self._size]
+
+    @property
+    def hours(self):
+        return self.derived('hours')
+
+    @property
+    def weekdays(self):
+        return self.derived('weekdays')
+
+    @property
+    def days(self):
+        return self.derived('days')
+
+    def transaction(self, row):
+        """Build a Transaction view for a single row"""
+        return Transaction.from_row(
+            int(self._ids[row]),
+            float(self._amounts[row]),
+            self.descriptions[row],
+            int(self._account_ids[row]),
+            self.categories[self._category_codes[row]],
+            int(self._timestamps[row]),
+            int(self._created_timestamps[row])
+        )
+
+    @timed('serialize')
+    def transactions(self, rows=None):
+        """Build Transaction views for the given rows (all rows by default)"""
+        if rows is None:
+            rows = range(self._size)
+        rows = list(rows)
+        categories = self.categories
+        return [
+            Transaction.from_row(tid, amount, self.descriptions[row], account_id,
+                                 categories[code], timestamp, created)
+            for row, tid, amount, account_id, code, timestamp, created in zip(
+                rows,
+                self._ids[rows].tolist(),
+                self._amounts[rows].tolist(),
+                self._account_ids[rows].tolist(),
+                self._category_codes[rows].tolist(),
+                self._timestamps[rows].tolist(),
+                self._created_timestamps[rows].tolist()
+            )
+        ]
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+# Timestamps are stored as naive wall-clock microseconds since 1970-01-01,
+# in the server's local time (the zone datetime.now() and naive inputs use)
+EPOCH = datetime(1970, 1, 1)
+MICROS_PER_SECOND = 1_000_000
+MICROS_PER_HOUR = 3_600 * MICROS_PER_SECOND
+MICROS_PER_DAY = 86_400 * MICROS_PER_SECOND
+
+# 1970-01-01 was a Thursday (weekday 3)
+EPOCH_WEEKDAY = 3
+
+# Dates accepted for new transactions. Per-day indexes are dense over an
+# account's date range, so the range must stay bounded.
+MIN_TRANSACTION_DATE = datetime(1900, 1, 1)
+MAX_TRANSACTION_DATE = datetime(2100, 1, 1)
+
+
+def parse_date(value):
+    """Parse and validate a transaction date (ISO string or datetime)"""
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid date: {value!r}")
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r}") from None
+
+
+def to_epoch(value=None):
+    """Convert an ISO string or datetime to epoch microseconds (now if None)"""
+    value = datetime.now() if value is None else parse_date(value)
+
+    if value.tzinfo is not None:
+        # Convert to local wall-clock time so the offset isn't lost
+        value = value.astimezone().replace(tzinfo=None)
+
+    delta = value - EPOCH
+    return (delta.days * 86_400 + delta.seconds) * MICROS_PER_SECOND + delta.microseconds
+
+
+def check_transaction_date(micros):
+    """Raise ValueError for a timestamp outside the accepted transaction dates"""
+    if not to_epoch(MIN_TRANSACTION_DATE) <= micros < to_epoch(MAX_TRANSACTION_DATE):
+        raise ValueError(f"Date out of range: {from_epoch(micros).isoformat()} (expected "
+                         f"{MIN_TRANSACTION_DATE.date()} to {MAX_TRANSACTION_DATE.date()})")
+
+
+def from_epoch(micros):
+    """Convert epoch microseconds back to a naive datetime"""
+    return EPOCH + timedelta(microseconds=int(micros))
+
+
+# Derived keys; these accept a single timestamp or an int64 array of them
+
+def hour_of_day(micros):
+    return (micros // MICROS_PER_HOUR) % 24
+
+
+def weekday(micros):
+    """Monday is 0 and Sunday is 6, like datetime.weekday()"""
+    return (micros // MICROS_PER_DAY + EPOCH_WEEKDAY) % 7
+
+
+def day_number(micros):
+    """Whole days since the epoch"""
+    return micros // MICROS_PER_DAY
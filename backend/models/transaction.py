@@ -1,14 +1,45 @@
-from datetime import datetime
+from models.timestamps import to_epoch, from_epoch
 
 class Transaction:
-    def __init__(self, transaction_id, amount, description, account_id, category="", date=None):
+    """Lightweight view of a single transaction.
+
+    The ledger keeps transactions column-wise; a Transaction is only built
+    when a caller needs a row as an object (e.g. for to_dict).
+    """
+    __slots__ = ('id', 'amount', 'description', 'account_id', 'category',
+                 'timestamp', 'created_timestamp')
+
+    def __init__(self, transaction_id, amount, description, account_id, category="", date=None,
+                 created_at=None):
         self.id = transaction_id
         self.amount = float(amount)
         self.description = description
         self.account_id = account_id
         self.category = category
-        self.date = date or datetime.now().isoformat()
-        self.created_at = datetime.now().isoformat()
+        self.timestamp = to_epoch(date)
+        self.created_timestamp = to_epoch(created_at)
+
+    @classmethod
+    def from_row(cls, transaction_id, amount, description, account_id, category, timestamp,
+                 created_timestamp):
+        """Build a view from already-normalized ledger columns"""
+        transaction = cls.__new__(cls)
+        transaction.id = transaction_id
+        transaction.amount = amount
+        transaction.description = description
+        transaction.account_id = account_id
+        transaction.category = category
+        transaction.timestamp = timestamp
+        transaction.created_timestamp = created_timestamp
+        return transaction
+
+    @property
+    def date(self):
+        return from_epoch(self.timestamp).isoformat()
+
+    @property
+    def created_at(self):
+        return from_epoch(self.created_timestamp).isoformat()
     
     def to_dict(self):
         return {
@@ -19,4 +50,4 @@ class Transaction:
             'category': self.category,
             'date': self.date,
             'created_at': self.created_at
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,177 @@
+import base64
+import heapq
+
+import numpy as np
+
+from instrumentation import record_scan
+from models.timestamps import to_epoch, MICROS_PER_DAY
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Rows examined per step when filters that the index can't answer are active
+SCAN_CHUNK = 512
+
+
+def encode_cursor(timestamp, transaction_id):
+    raw = f"{timestamp}:{transaction_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, transaction_id = base64.urlsafe_b64decode(padded).decode().split(':')
+        return int(timestamp), int(transaction_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from None
+
+
+def _is_date_only(value):
+    return isinstance(value, str) and 'T' not in value and ' ' not in value.strip()
+
+
+def _end_of(date_to):
+    """Exclusive epoch bound for an inclusive date_to"""
+    if _is_date_only(date_to):
+        return to_epoch(date_to) + MICROS_PER_DAY
+    return to_epoch(date_to) + 1
+
+
+class TransactionQuery:
+    """Keyset pagination and filters for transaction listings.
+
+    Pages are ordered by (date, id); the cursor is the key of the last row
+    of the previous page.
+    """
+
+    def __init__(self, limit=DEFAULT_PAGE_SIZE, cursor=None, descending=False, date_from=None,
+                 date_to=None, min_amount=None, max_amount=None, category=None, search=None):
+        self.limit = max(1, min(limit, MAX_PAGE_SIZE))
+        self.cursor = decode_cursor(cursor) if cursor else None
+        self.descending = descending
+        self.date_from = to_epoch(date_from) if date_from else None
+        # Exclusive end; a date-only date_to includes that whole day
+        self.date_end = _end_of(date_to) if date_to else None
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+        self.category = category
+        self.search = search.lower() if search else None
+
+    @classmethod
+    def from_args(cls, args):
+        """Build a query from request args; raises ValueError on bad input"""
+        order = args.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Invalid order: {order!r}")
+
+        def number(name, convert):
+            value = args.get(name)
+            if value in (None, ''):
+                return None
+            try:
+                return convert(value)
+            except ValueError:
+                raise ValueError(f"Invalid {name}: {value!r}") from None
+
+        limit = number('limit', int)
+        return cls(
+            limit=DEFAULT_PAGE_SIZE if limit is None else limit,
+            cursor=args.get('cursor'),
+            descending=order == 'desc',
+            date_from=args.get('date_from'),
+            date_to=args.get('date_to'),
+            min_amount=number('min_amount', float),
+            max_amount=number('max_amount', float),
+            category=args.get('category'),
+            search=args.get('q')
+        )
+
+    def _bounds(self, index):
+        """Position range of the index that the date range and cursor allow"""
+        timestamps = index.timestamps
+        start = 0 if self.date_from is None else int(np.searchsorted(timestamps, self.date_from, 'left'))
+        end = len(index) if self.date_end is None else int(np.searchsorted(timestamps, self.date_end, 'left'))
+
+        if self.cursor:
+            if self.descending:
+                end = min(end, index.position(*self.cursor))
+            else:
+                start = max(start, index.position(*self.cursor, after=True))
+        return start, end
+
+    def _matches(self, ledger, rows):
+        """Filter a chunk of rows by amount, category and description"""
+        keep = np.ones(len(rows), dtype=bool)
+        if self.min_amount is not None or self.max_amount is not None:
+            amounts = ledger.amounts[rows]
+            if self.min_amount is not None:
+                keep &= amounts >= self.min_amount
+            if self.max_amount is not None:
+                keep &= amounts <= self.max_amount
+        if self.category is not None:
+            keep &= ledger.category_codes[rows] == ledger.category_code(self.category)
+
+        rows = rows[keep]
+        if self.search:
+            descriptions = ledger.descriptions
+            rows = [row for row in rows.tolist() if self.search in descriptions[row].lower()]
+        return rows
+
+    def _filtered(self):
+        return (self.min_amount is not None or self.max_amount is not None
+                or self.category is not None or self.search)
+
+    def page_keys(self, ledger, count):
+        """Up to `count` matching (timestamp, id, row) keys from one ledger, in page order"""
+        index = ledger.index
+        start, end = self._bounds(index)
+        if self.category is not None and ledger.category_code(self.category) is None:
+            return []
+
+        if not self._filtered():
+            # Everything in range matches: slice the index directly
+            positions = range(end - 1, max(start, end - count) - 1, -1) if self.descending \
+                else range(start, min(end, start + count))
+            record_scan(len(positions))
+            return [(int(index.timestamps[p]), int(index.ids[p]), int(index.rows[p])) for p in positions]
+
+        keys = []
+        while start < end and len(keys) < count:
+            if self.descending:
+                chunk = index.rows[max(start, end - SCAN_CHUNK):end][::-1]
+                end = max(start, end - SCAN_CHUNK)
+            else:
+                chunk = index.rows[start:min(end, start + SCAN_CHUNK)]
+                start = min(end, start + SCAN_CHUNK)
+            record_scan(len(chunk))
+            for row in self._matches(ledger, chunk):
+                keys.append((int(ledger.timestamps[row]), int(ledger.ids[row]), int(row)))
+        return keys[:count]
+
+
+def _page(keys, query):
+    """Split limit+1 keys into the page and the cursor for the next one"""
+    has_more = len(keys) > query.limit
+    keys = keys[:query.limit]
+    next_cursor = encode_cursor(keys[-1][0], keys[-1][1]) if has_more else None
+    return keys, next_cursor
+
+
+def page_account_transactions(account, query):
+    """One page of an account's transactions: (transactions, next_cursor)"""
+    ledger = account.ledger
+    keys, next_cursor = _page(query.page_keys(ledger, query.limit + 1), query)
+    return ledger.transactions(row for _, _, row in keys), next_cursor
+
+
+def page_user_transactions(accounts, query):
+    """One page across all of a user's accounts, merged by (date, id)"""
+    streams = []
+    for account in accounts:
+        keys = query.page_keys(account.ledger, query.limit + 1)
+        streams.append([(timestamp, transaction_id, account, row) for timestamp, transaction_id, row in keys])
+
+    merged = heapq.merge(*streams, key=lambda key: (key[0], key[1]), reverse=query.descending)
+    keys, next_cursor = _page([key for key, _ in zip(merged, range(query.limit + 1))], query)
+    return [account.ledger.transaction(row) for _, _, account, row in keys], next_cursor
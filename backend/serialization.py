@@ -0,0 +1,91 @@
+"""JSON encoding for API responses.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Either way enums, datetimes and NumPy scalars/arrays are
+encoded natively, so models can hand back their own types.
+"""
+import json
+from datetime import date, datetime
+from enum import Enum
+
+import numpy as np
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Items encoded per chunk when streaming a JSON array
+STREAM_CHUNK = 500
+
+
+def default(obj):
+    """Encode the non-JSON types that show up in model dicts"""
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj, sort_keys=False, indent=None):
+        options = _ORJSON_OPTIONS
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=options).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(obj, sort_keys=False, indent=None):
+        separators = None if indent else (',', ':')
+        return json.dumps(obj, default=default, sort_keys=sort_keys, indent=indent, separators=separators)
+
+    loads = json.loads
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by dumps()/loads() above"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys), indent=kwargs.get('indent'))
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+
+def iter_json_object(fields, stream_key, items, chunk_size=STREAM_CHUNK):
+    """Yield a JSON object piece by piece; `items` becomes its `stream_key` array.
+
+    The array is encoded `chunk_size` items at a time, so the whole
+    response string is never held in memory.
+    """
+    yield '{' + dumps(stream_key) + ':['
+    first = True
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield ('' if first else ',') + dumps(chunk)[1:-1]
+            first = False
+            chunk = []
+    if chunk:
+        yield ('' if first else ',') + dumps(chunk)[1:-1]
+
+    rest = dumps(fields)[1:]  # '}' alone when there are no other fields
+    yield ']' + (',' + rest if rest != '}' else rest)
+
+
+def stream_json(fields, stream_key, items, status=200):
+    """Chunked JSON response built by iter_json_object()"""
+    return Response(iter_json_object(fields, stream_key, items), status=status, mimetype='application/json')
@@ -0,0 +1,74 @@
+"""Pre-forking WSGI server for running several workers locally.
+
+    PENNYPINCHER_STORE='sqlite:///pennypincher.db?shards=4' python serve.py --workers 4 --port 5000
+
+The parent binds the socket and forks the workers, which all accept on
+it, each serving requests on a thread apiece. The app is imported in
+each worker after the fork, so no store connections or pools are shared
+between processes.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+
+
+def _run_worker(sock, quiet):
+    from werkzeug.serving import make_server
+
+    from wsgi import application
+
+    if quiet:
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    host, port = sock.getsockname()[:2]
+    # Threaded, so an open alert stream or long poll doesn't hold up the whole worker
+    server = make_server(host, port, application, threaded=True, fd=sock.fileno())
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server.serve_forever()
+
+
+def serve(host, port, workers, quiet=False):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(sock, quiet)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    print(f"Serving on http://{host}:{port} with {workers} workers", file=sys.stderr)
+
+    def stop(*_):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--quiet', action='store_true', help="don't log every request")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.quiet)
+
+
+if __name__ == '__main__':
+    main()
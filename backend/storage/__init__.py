@@ -0,0 +1,44 @@
+import os
+from urllib.parse import parse_qs
+
+from storage.base import Store, empty_user_data, build_user_data, advance_revision
+from storage.log import LogStore, DEFAULT_SNAPSHOT_EVERY
+from storage.memory import MemoryStore
+from storage.sharded import ShardedStore, shard_for
+from storage.sqlite import SQLiteStore
+
+
+def open_store(url, locks=None, read_only=False):
+    """Open a store from a URL: 'memory://', 'log:///path/to/dir' or
+    'sqlite:///path/to/file.db'.
+
+    'sqlite:///path/to/file.db?shards=N' spreads users over N database
+    files (file.0.db ... file.N-1.db) by a hash of the user id.
+
+    'log:///path/to/dir?snapshot_every=N&fsync=0' tunes the log store;
+    `locks` (the app's UserLocks) keeps its snapshots consistent.
+
+    With `read_only`, log and SQLite stores are opened without writing to
+    them (no schema changes, log truncation or snapshots).
+    """
+    if url == 'memory://':
+        return MemoryStore()
+    if url.startswith('log:///'):
+        path, _, query = url[len('log:///'):].partition('?')
+        options = parse_qs(query)
+        return LogStore(
+            path,
+            snapshot_every=int(options.get('snapshot_every', [DEFAULT_SNAPSHOT_EVERY])[0]),
+            fsync=options.get('fsync', ['1'])[0] != '0',
+            locks=locks,
+            read_only=read_only
+        )
+    if url.startswith('sqlite:///'):
+        path, _, query = url[len('sqlite:///'):].partition('?')
+        shards = int(parse_qs(query).get('shards', ['1'])[0])
+        if shards <= 1:
+            return SQLiteStore(path, read_only=read_only)
+        base, ext = os.path.splitext(path)
+        return ShardedStore(SQLiteStore(f"{base}.{shard}{ext or '.db'}", read_only=read_only)
+                            for shard in range(shards))
+    raise ValueError(f"Unsupported store URL: {url}")
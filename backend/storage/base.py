@@ -0,0 +1,96 @@
+def empty_user_data():
+    return {
+        'folders': {},
+        'accounts': {},
+        'transactions': {},  # transaction_id -> account_id (rows live in the account ledgers)
+        'revision': 0,  # store revision this copy reflects
+    }
+
+
+def build_user_data(folders, accounts):
+    """A user data dict holding the given folders and accounts"""
+    user_data = empty_user_data()
+    for folder in folders:
+        user_data['folders'][folder.id] = folder
+    for account in accounts:
+        user_data['accounts'][account.id] = account
+        user_data['folders'][account.folder_id].add_account(account)
+    return user_data
+
+
+def advance_revision(user_data, revision):
+    """Record the revision returned by a save, if no other process wrote in between.
+
+    Otherwise the copy stays behind and the next refresh_user() pulls in
+    the other writes (skipping this one, which is already held).
+    """
+    if revision is not None and revision == user_data['revision'] + 1:
+        user_data['revision'] = revision
+
+
+class Store:
+    """Persistence backend for users' folders, accounts and transactions.
+
+    The app keeps hydrated model objects in memory; a store is responsible
+    for loading them, persisting every new object and handing out ids.
+    Id kinds are 'folder', 'account' and 'transaction'.
+
+    A `shared` store can be written by several processes at once; each
+    keeps its own in-memory copy of a user and calls refresh_user() to
+    catch up. Saves return the user's new revision (or None when the store
+    doesn't track revisions).
+
+    A `resident` store keeps every user's models in memory itself, so
+    load_user() hands back the live objects and there is nothing for a
+    cache in front of it to save or evict.
+    """
+
+    shared = False
+    resident = False
+
+    def load_user(self, user_id):
+        """Return the user's data dict, or None if the user doesn't exist"""
+        raise NotImplementedError
+
+    def has_user(self, user_id):
+        """Whether the user exists, without loading it"""
+        return self.load_user(user_id) is not None
+
+    def user_ids(self):
+        """Iterate over the ids of every stored user, without loading them"""
+        raise NotImplementedError
+
+    def create_user(self, user_id, folders=(), accounts=()):
+        """Register a new user with its initial folders and accounts (ids
+        numbered from 1) in one step, and return its data dict.
+
+        Returns None if the user already exists (e.g. another process
+        created it first).
+        """
+        raise NotImplementedError
+
+    def revision(self, user_id):
+        """The user's current revision, or None if the user doesn't exist"""
+        return None
+
+    def refresh_user(self, user_id, user_data):
+        """Apply writes made by other processes since user_data['revision'];
+        returns True if anything was loaded"""
+        return False
+
+    def allocate_ids(self, user_id, kind, count=1):
+        """Reserve `count` consecutive ids and return the first one"""
+        raise NotImplementedError
+
+    def save_folder(self, user_id, folder):
+        raise NotImplementedError
+
+    def save_account(self, user_id, account):
+        raise NotImplementedError
+
+    def save_transactions(self, user_id, transactions):
+        """Persist a batch of new transactions"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
@@ -0,0 +1,415 @@
+import glob
+import os
+import shutil
+import threading
+from contextlib import nullcontext
+
+import numpy as np
+
+import serialization
+from models.account import Account
+from models.folder import Folder
+from models.transaction import Transaction
+from storage.base import build_user_data
+from storage.memory import MemoryStore
+
+# Log records between automatic snapshots
+DEFAULT_SNAPSHOT_EVERY = 100_000
+
+# Snapshot columns, concatenated over every account of every user
+SNAPSHOT_COLUMNS = {
+    'ids': np.int64,
+    'amounts': np.float64,
+    'timestamps': np.int64,
+    'created_timestamps': np.int64,
+    'category_codes': np.int32,
+}
+
+
+class LogStore(MemoryStore):
+    """In-memory store made durable by a write-ahead log and snapshots.
+
+    Every new user, folder, account and batch of transactions is appended
+    to an NDJSON log before the save returns. Saves from all threads are
+    group-committed: a writer thread takes everything queued since its
+    last write and covers it with a single fsync.
+
+    Every `snapshot_every` records the log moves on to a new segment and a
+    columnar snapshot of all users is written in the background; older
+    segments and snapshots are then deleted. On open the newest snapshot is
+    loaded (its columns memory-mapped) and only the segments after it are
+    replayed. Replay skips anything the snapshot already holds, so a
+    snapshot may safely include writes logged after its segment started.
+
+    `locks` (a UserLocks) lets snapshots read each user under its read lock.
+
+    With `read_only`, the directory is loaded without changing it (a torn
+    tail is skipped, not cut off) and there is no writer: saves raise, and
+    close() takes no snapshot. Offline tools read a live store this way.
+    """
+
+    def __init__(self, directory, snapshot_every=DEFAULT_SNAPSHOT_EVERY, fsync=True, locks=None,
+                 read_only=False):
+        super().__init__()
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.locks = locks
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+
+        self._cond = threading.Condition(threading.Lock())
+        self._queue = []
+        self._queued = 0  # records appended so far
+        self._durable = 0  # records written (and synced) so far
+        self._since_snapshot = 0
+        self._snapshotting = False
+        self._closed = False
+        self._error = None
+
+        self.segment = self._recover()
+        self._writer = None
+        if not read_only:
+            self._writer = threading.Thread(target=self._write_loop, name='log-writer', daemon=True)
+            self._writer.start()
+
+    # Files
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f'log-{segment:08d}.ndjson')
+
+    def _snapshot_path(self, segment):
+        return os.path.join(self.directory, f'snapshot-{segment:08d}')
+
+    @staticmethod
+    def _number(path):
+        return int(os.path.basename(path).split('-')[1].split('.')[0])
+
+    def _segments(self):
+        return sorted(self._number(path) for path in glob.glob(os.path.join(self.directory, 'log-*.ndjson')))
+
+    def _snapshots(self):
+        return sorted(self._number(path) for path in glob.glob(os.path.join(self.directory, 'snapshot-*'))
+                      if not path.endswith('.tmp'))
+
+    # Recovery
+
+    def _recover(self):
+        """Load the newest snapshot and replay the log after it; returns the segment to append to"""
+        snapshots = self._snapshots()
+        first_segment = 0
+        if snapshots:
+            first_segment = snapshots[-1]
+            self._load_snapshot(self._snapshot_path(first_segment))
+
+        segments = [segment for segment in self._segments() if segment >= first_segment]
+        for segment in segments:
+            # Replayed records count toward the next snapshot
+            self._since_snapshot += self._replay(self._segment_path(segment))
+        return segments[-1] if segments else first_segment
+
+    def _load_snapshot(self, path):
+        with open(os.path.join(path, 'users.json'), 'rb') as f:
+            meta = serialization.loads(f.read())
+        with open(os.path.join(path, 'descriptions.json'), 'rb') as f:
+            descriptions = serialization.loads(f.read())
+        columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in SNAPSHOT_COLUMNS}
+        categories = meta['categories']
+
+        for user in meta['users']:
+            folders = [Folder(*row) for row in user['folders']]
+            accounts = []
+            ranges = []
+            for row in user['accounts']:
+                (account_id, folder_id, name, account_type, budget, target, deadline,
+                 balance, created_at, start, end) = row
+                account = Account(account_id, name, account_type, folder_id, monthly_budget=budget,
+                                  target_amount=target, deadline=deadline, current_balance=balance)
+                account.created_at = created_at
+                accounts.append(account)
+                ranges.append((account, start, end))
+
+            user_data = build_user_data(folders, accounts)
+            index = user_data['transactions']
+            for account, start, end in ranges:
+                if end > start:
+                    ids = np.array(columns['ids'][start:end])
+                    account.add_columns(ids, np.array(columns['amounts'][start:end]),
+                                        np.array(columns['timestamps'][start:end]),
+                                        np.array(columns['created_timestamps'][start:end]),
+                                        np.array(columns['category_codes'][start:end]),
+                                        categories, descriptions[start:end])
+                    index.update(dict.fromkeys(ids.tolist(), account.id))
+
+            self.users[user['id']] = user_data
+            for kind, next_id in user['next_ids'].items():
+                self._next_ids[(user['id'], kind)] = next_id
+            for kind, held in (('folder', user_data['folders']), ('account', user_data['accounts']),
+                               ('transaction', index)):
+                if held:
+                    self._bump_next_id(user['id'], kind, max(held))
+
+    def _replay(self, path):
+        """Apply a log segment; returns the number of records.
+
+        A torn final write from a crash is cut off the file, so records
+        appended after recovery start on a line of their own.
+        """
+        count = 0
+        complete = 0  # bytes up to the end of the last whole line
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._apply(serialization.loads(line))
+                complete += len(line)
+                count += 1
+        if not self.read_only and os.path.getsize(path) > complete:
+            with open(path, 'r+b') as f:
+                f.truncate(complete)
+                if self.fsync:
+                    os.fsync(f.fileno())
+        return count
+
+    def _bump_next_id(self, user_id, kind, used_id):
+        key = (user_id, kind)
+        self._next_ids[key] = max(self._next_ids.get(key, 1), used_id + 1)
+
+    def _apply(self, record):
+        """Apply one log record during replay, skipping what is already held"""
+        user_id = record['user']
+        op = record['op']
+        if op == 'user':
+            if user_id not in self.users:
+                MemoryStore.create_user(self, user_id, [Folder(*row) for row in record['folders']],
+                                        [self._account_from_row(row) for row in record['accounts']])
+            return
+
+        user_data = self.users[user_id]
+        if op == 'folder':
+            folder = Folder(*record['row'])
+            user_data['folders'].setdefault(folder.id, folder)
+            self._bump_next_id(user_id, 'folder', folder.id)
+        elif op == 'account':
+            account = self._account_from_row(record['row'])
+            if account.id not in user_data['accounts']:
+                user_data['accounts'][account.id] = account
+                user_data['folders'][account.folder_id].add_account(account)
+            self._bump_next_id(user_id, 'account', account.id)
+        elif op == 'transactions':
+            index = user_data['transactions']
+            by_account = {}
+            for transaction_id, account_id, amount, description, category, timestamp, created in record['rows']:
+                self._bump_next_id(user_id, 'transaction', transaction_id)
+                if transaction_id in index:
+                    continue
+                by_account.setdefault(account_id, []).append(
+                    Transaction.from_row(transaction_id, amount, description, account_id, category,
+                                         timestamp, created))
+                index[transaction_id] = account_id
+            for account_id, transactions in by_account.items():
+                user_data['accounts'][account_id].add_transactions(transactions)
+
+    @staticmethod
+    def _folder_row(folder):
+        return [folder.id, folder.name, folder.description, folder.icon]
+
+    @staticmethod
+    def _account_row(account):
+        return [account.id, account.folder_id, account.name, account.type.value, account.monthly_budget,
+                account.target_amount, account.deadline, account.opening_balance, account.created_at]
+
+    @staticmethod
+    def _account_from_row(row):
+        account_id, folder_id, name, account_type, budget, target, deadline, balance, created_at = row
+        account = Account(account_id, name, account_type, folder_id, monthly_budget=budget,
+                          target_amount=target, deadline=deadline, current_balance=balance)
+        account.created_at = created_at
+        return account
+
+    # Logging
+
+    def _write_loop(self):
+        """Write queued records and fsync them, one batch per sync (group commit)"""
+        file, file_segment = None, None
+        try:
+            while True:
+                with self._cond:
+                    while not self._queue and not self._closed:
+                        self._cond.wait()
+                    if not self._queue:
+                        return
+                    batch, self._queue = self._queue, []
+                    target = self._queued
+                    segment = self.segment
+
+                if segment != file_segment:
+                    if file is not None:
+                        file.close()
+                    file, file_segment = open(self._segment_path(segment), 'ab'), segment
+                file.write(b''.join(batch))
+                file.flush()
+                if self.fsync:
+                    os.fsync(file.fileno())
+
+                with self._cond:
+                    self._durable = target
+                    self._cond.notify_all()
+        except OSError as e:
+            with self._cond:
+                self._error = e
+                self._cond.notify_all()
+        finally:
+            if file is not None:
+                file.close()
+
+    def _append(self, record):
+        """Queue a record and block until it is durable"""
+        line = serialization.dumps(record).encode() + b'\n'
+        with self._cond:
+            if self._error is not None:
+                raise self._error
+            if self._closed:
+                raise RuntimeError("Log store is closed")
+            if self.read_only:
+                raise RuntimeError("Log store is read-only")
+            self._queue.append(line)
+            self._queued += 1
+            position = self._queued
+            self._since_snapshot += 1
+            start_snapshot = self._since_snapshot >= self.snapshot_every and not self._snapshotting
+            if start_snapshot:
+                self._snapshotting = True
+            self._cond.notify_all()
+            while self._durable < position and self._error is None:
+                self._cond.wait()
+            if self._error is not None:
+                raise self._error
+
+        if start_snapshot:
+            threading.Thread(target=self._snapshot_in_background, name='log-snapshot', daemon=True).start()
+
+    def create_user(self, user_id, folders=(), accounts=()):
+        user_data = super().create_user(user_id, folders, accounts)
+        if user_data is not None:
+            self._append({'op': 'user', 'user': user_id,
+                          'folders': [self._folder_row(folder) for folder in folders],
+                          'accounts': [self._account_row(account) for account in accounts]})
+        return user_data
+
+    def save_folder(self, user_id, folder):
+        self._append({'op': 'folder', 'user': user_id, 'row': self._folder_row(folder)})
+
+    def save_account(self, user_id, account):
+        self._append({'op': 'account', 'user': user_id, 'row': self._account_row(account)})
+
+    def save_transactions(self, user_id, transactions):
+        self._append({'op': 'transactions', 'user': user_id, 'rows': [
+            [t.id, t.account_id, t.amount, t.description, t.category, t.timestamp, t.created_timestamp]
+            for t in transactions
+        ]})
+
+    # Snapshots
+
+    def _rotate(self):
+        """Send later writes to a new log segment; returns its number.
+
+        Records still queued land in the new segment too, which is fine:
+        replay skips whatever the snapshot already holds.
+        """
+        with self._cond:
+            self.segment += 1
+            self._since_snapshot = 0
+            return self.segment
+
+    def _snapshot_in_background(self):
+        try:
+            self.snapshot()
+        finally:
+            with self._cond:
+                self._snapshotting = False
+
+    def snapshot(self):
+        """Write a snapshot of every user and drop the log and snapshots it replaces.
+
+        Each user is read under its read lock, after any save already in the
+        old segments has been applied to the models. Without `locks`, only
+        call this while no writes are in flight.
+        """
+        if self.read_only:
+            raise RuntimeError("Log store is read-only")
+        segment = self._rotate()
+        path = self._snapshot_path(segment)
+        temporary = path + '.tmp'
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+
+        categories = {}
+        users = []
+        parts = {name: [] for name in SNAPSHOT_COLUMNS}
+        descriptions = []
+        offset = 0
+        for user_id, user_data in list(self.users.items()):
+            lock = self.locks.read(user_id) if self.locks is not None else nullcontext()
+            with lock:
+                accounts = []
+                for account in list(user_data['accounts'].values()):
+                    ledger = account.ledger
+                    size = len(ledger)
+                    lookup = np.array([categories.setdefault(name, len(categories)) for name in ledger.categories],
+                                      dtype=np.int32)
+                    parts['ids'].append(ledger.ids[:size].copy())
+                    parts['amounts'].append(ledger.amounts[:size].copy())
+                    parts['timestamps'].append(ledger.timestamps[:size].copy())
+                    parts['created_timestamps'].append(ledger.created_timestamps[:size].copy())
+                    parts['category_codes'].append(lookup[ledger.category_codes[:size]] if size else
+                                                   np.empty(0, dtype=np.int32))
+                    descriptions.extend(ledger.descriptions[:size])
+                    accounts.append(self._account_row(account) + [offset, offset + size])
+                    offset += size
+                users.append({
+                    'id': user_id,
+                    'folders': [self._folder_row(folder) for folder in list(user_data['folders'].values())],
+                    'accounts': accounts,
+                    'next_ids': {kind: self._next_ids[(user_id, kind)]
+                                 for kind in ('folder', 'account', 'transaction')
+                                 if (user_id, kind) in self._next_ids},
+                })
+
+        for name, dtype in SNAPSHOT_COLUMNS.items():
+            column = np.concatenate(parts[name]).astype(dtype) if parts[name] else np.empty(0, dtype=dtype)
+            np.save(os.path.join(temporary, f'{name}.npy'), column)
+        with open(os.path.join(temporary, 'descriptions.json'), 'w') as f:
+            f.write(serialization.dumps(descriptions))
+        with open(os.path.join(temporary, 'users.json'), 'w') as f:
+            f.write(serialization.dumps({'categories': list(categories), 'users': users}))
+
+        if self.fsync:
+            for name in os.listdir(temporary):
+                with open(os.path.join(temporary, name), 'rb') as f:
+                    os.fsync(f.fileno())
+        os.rename(temporary, path)
+
+        # Everything before this segment is now covered by the snapshot
+        for old in self._snapshots():
+            if old < segment:
+                shutil.rmtree(self._snapshot_path(old), ignore_errors=True)
+        for old in self._segments():
+            if old < segment:
+                os.remove(self._segment_path(old))
+        return path
+
+    def close(self):
+        """Snapshot anything logged since the last snapshot, then stop the writer"""
+        with self._cond:
+            if self._closed:
+                return
+            pending = self._since_snapshot and not self._snapshotting and not self.read_only
+        if pending:
+            self.snapshot()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join()
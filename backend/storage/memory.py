@@ -0,0 +1,51 @@
+import threading
+
+from storage.base import Store, build_user_data
+
+class MemoryStore(Store):
+    """Keeps everything in process memory; nothing survives a restart.
+
+    The app's model objects are the stored data, so saves are no-ops.
+    """
+
+    resident = True
+
+    def __init__(self):
+        self.users = {}
+        self._next_ids = {}
+        self._lock = threading.Lock()
+
+    def load_user(self, user_id):
+        return self.users.get(user_id)
+
+    def has_user(self, user_id):
+        return user_id in self.users
+
+    def user_ids(self):
+        with self._lock:
+            return iter(list(self.users))
+
+    def create_user(self, user_id, folders=(), accounts=()):
+        with self._lock:
+            if user_id in self.users:
+                return None
+            user_data = build_user_data(folders, accounts)
+            self.users[user_id] = user_data
+            self._next_ids[(user_id, 'folder')] = len(folders) + 1
+            self._next_ids[(user_id, 'account')] = len(accounts) + 1
+            return user_data
+
+    def allocate_ids(self, user_id, kind, count=1):
+        with self._lock:
+            first = self._next_ids.get((user_id, kind), 1)
+            self._next_ids[(user_id, kind)] = first + count
+            return first
+
+    def save_folder(self, user_id, folder):
+        pass
+
+    def save_account(self, user_id, account):
+        pass
+
+    def save_transactions(self, user_id, transactions):
+        pass
@@ -0,0 +1,60 @@
+import zlib
+
+from storage.base import Store
+
+
+def shard_for(user_id, shard_count):
+    """Stable shard number for a user (the same in every process)"""
+    return zlib.crc32(str(user_id).encode()) % shard_count
+
+
+class ShardedStore(Store):
+    """Spreads users over several stores by a hash of user_id.
+
+    Every call concerns a single user, so it is routed to that user's
+    shard; with SQLite shards, writers for different users mostly take
+    different database locks.
+    """
+
+    def __init__(self, shards):
+        self.shards = list(shards)
+        self.shared = any(shard.shared for shard in self.shards)
+        self.resident = all(shard.resident for shard in self.shards)
+
+    def shard(self, user_id):
+        return self.shards[shard_for(user_id, len(self.shards))]
+
+    def load_user(self, user_id):
+        return self.shard(user_id).load_user(user_id)
+
+    def has_user(self, user_id):
+        return self.shard(user_id).has_user(user_id)
+
+    def user_ids(self):
+        for shard in self.shards:
+            yield from shard.user_ids()
+
+    def create_user(self, user_id, folders=(), accounts=()):
+        return self.shard(user_id).create_user(user_id, folders, accounts)
+
+    def revision(self, user_id):
+        return self.shard(user_id).revision(user_id)
+
+    def refresh_user(self, user_id, user_data):
+        return self.shard(user_id).refresh_user(user_id, user_data)
+
+    def allocate_ids(self, user_id, kind, count=1):
+        return self.shard(user_id).allocate_ids(user_id, kind, count)
+
+    def save_folder(self, user_id, folder):
+        return self.shard(user_id).save_folder(user_id, folder)
+
+    def save_account(self, user_id, account):
+        return self.shard(user_id).save_account(user_id, account)
+
+    def save_transactions(self, user_id, transactions):
+        return self.shard(user_id).save_transactions(user_id, transactions)
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
@@ -0,0 +1,317 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import quote
+
+from models.account import Account
+from models.folder import Folder
+from models.transaction import Transaction
+from storage.base import Store, empty_user_data, build_user_data
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0  -- bumped by every write to the user
+);
+CREATE TABLE IF NOT EXISTS id_counters (
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    next_id INTEGER NOT NULL,
+    PRIMARY KEY (user_id, kind)
+);
+CREATE TABLE IF NOT EXISTS folders (
+    user_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    icon TEXT NOT NULL,
+    seq INTEGER NOT NULL,  -- user revision that wrote the row
+    PRIMARY KEY (user_id, id)
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    user_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    folder_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    monthly_budget REAL NOT NULL,
+    target_amount REAL NOT NULL,
+    deadline TEXT,
+    opening_balance REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    seq INTEGER NOT NULL,  -- user revision that wrote the row
+    PRIMARY KEY (user_id, id)
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    user_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    account_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    description TEXT NOT NULL,
+    category TEXT NOT NULL,
+    date INTEGER NOT NULL,        -- epoch microseconds
+    created_at INTEGER NOT NULL,  -- epoch microseconds
+    seq INTEGER NOT NULL,  -- user revision that wrote the row
+    PRIMARY KEY (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_account_date
+    ON transactions (user_id, account_id, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_seq ON transactions (user_id, seq);
+"""
+
+INSERT_TRANSACTION = (
+    "INSERT INTO transactions (user_id, id, account_id, amount, description, category, date, created_at, seq) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+class ConnectionPool:
+    """A small pool of SQLite connections shared by request threads"""
+
+    def __init__(self, path, size=8, timeout=30, read_only=False):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.read_only = read_only
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.read_only:
+            conn = sqlite3.connect(f"file:{quote(os.path.abspath(self.path))}?mode=ro", uri=True,
+                                   timeout=self.timeout, check_same_thread=False,
+                                   isolation_level=None, cached_statements=256)
+            return conn
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               isolation_level=None, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            conn = self._connect() if can_create else self._idle.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class SQLiteStore(Store):
+    """SQLite-backed store (WAL mode) that survives restarts and is shared
+    safely between processes.
+
+    Every write bumps the user's revision and stamps the rows it inserts
+    with it, so a process holding a user in memory can pull in what other
+    processes wrote with refresh_user().
+
+    A `read_only` store opens the database read-only and never creates the schema.
+    """
+
+    shared = True
+
+    def __init__(self, path, pool_size=8, read_only=False):
+        self.path = path
+        self.pool = ConnectionPool(path, size=pool_size, read_only=read_only)
+        if read_only:
+            return
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _write(self):
+        """A write transaction; BEGIN IMMEDIATE takes the write lock up front"""
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def _read(self):
+        """A read transaction, so every SELECT in it sees the same snapshot"""
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.execute("COMMIT")
+
+    def _bump_revision(self, conn, user_id):
+        # fetchall() so the statement is finished before COMMIT
+        [(revision,)] = conn.execute(
+            "UPDATE users SET revision = revision + 1 WHERE user_id = ? RETURNING revision",
+            (user_id,)).fetchall()
+        return revision
+
+    def _load_rows(self, conn, user_id, user_data, since):
+        """Add folders, accounts and transactions written after revision `since`,
+        skipping any this process already holds"""
+        folders = user_data['folders']
+        for folder_id, name, description, icon in conn.execute(
+                "SELECT id, name, description, icon FROM folders WHERE user_id = ? AND seq > ? ORDER BY id",
+                (user_id, since)):
+            if folder_id not in folders:
+                folders[folder_id] = Folder(folder_id, name, description, icon)
+
+        accounts = user_data['accounts']
+        for row in conn.execute(
+                "SELECT id, folder_id, name, type, monthly_budget, target_amount, deadline, "
+                "opening_balance, created_at FROM accounts WHERE user_id = ? AND seq > ? ORDER BY id",
+                (user_id, since)):
+            account_id, folder_id, name, account_type, budget, target, deadline, balance, created_at = row
+            if account_id in accounts:
+                continue
+            account = Account(account_id, name, account_type, folder_id, monthly_budget=budget,
+                              target_amount=target, deadline=deadline, current_balance=balance)
+            account.created_at = created_at
+            accounts[account_id] = account
+            folder = folders.get(folder_id)
+            if folder:
+                folder.add_account(account)
+
+        index = user_data['transactions']
+        by_account = {}
+        cursor = conn.execute(
+            "SELECT id, account_id, amount, description, category, date, created_at "
+            "FROM transactions WHERE user_id = ? AND seq > ? ORDER BY id", (user_id, since))
+        for transaction_id, account_id, amount, description, category, date, created_at in cursor:
+            if transaction_id in index:
+                continue
+            by_account.setdefault(account_id, []).append(
+                Transaction.from_row(transaction_id, amount, description, account_id, category, date, created_at))
+            index[transaction_id] = account_id
+        for account_id, transactions in by_account.items():
+            accounts[account_id].add_transactions(transactions)
+
+    def load_user(self, user_id):
+        with self._read() as conn:
+            row = conn.execute("SELECT revision FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                return None
+
+            user_data = empty_user_data()
+            self._load_rows(conn, user_id, user_data, since=-1)
+            user_data['revision'] = row[0]
+
+        return user_data
+
+    def has_user(self, user_id):
+        return self.revision(user_id) is not None
+
+    def user_ids(self, page_size=1000):
+        """Stream user ids a page at a time (keyset paging on the primary key)"""
+        last = ''
+        while True:
+            with self.pool.connection() as conn:
+                page = [row[0] for row in conn.execute(
+                    "SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?", (last, page_size))]
+            yield from page
+            if len(page) < page_size:
+                return
+            last = page[-1]
+
+    def revision(self, user_id):
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT revision FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def refresh_user(self, user_id, user_data):
+        if self.revision(user_id) == user_data['revision']:
+            return False
+
+        with self._read() as conn:
+            [(revision,)] = conn.execute("SELECT revision FROM users WHERE user_id = ?", (user_id,)).fetchall()
+            self._load_rows(conn, user_id, user_data, since=user_data['revision'])
+            user_data['revision'] = revision
+        return True
+
+    def create_user(self, user_id, folders=(), accounts=()):
+        with self._write() as conn:
+            cursor = conn.execute("INSERT OR IGNORE INTO users (user_id, created_at) VALUES (?, ?)",
+                                  (user_id, datetime.now().isoformat()))
+            if cursor.rowcount == 0:
+                return None
+            if folders or accounts:
+                revision = self._bump_revision(conn, user_id)
+                for folder in folders:
+                    self._insert_folder(conn, user_id, folder, revision)
+                for account in accounts:
+                    self._insert_account(conn, user_id, account, revision)
+                conn.executemany("INSERT INTO id_counters (user_id, kind, next_id) VALUES (?, ?, ?)",
+                                 [(user_id, 'folder', len(folders) + 1), (user_id, 'account', len(accounts) + 1)])
+
+        user_data = build_user_data(folders, accounts)
+        user_data['revision'] = 1 if folders or accounts else 0
+        return user_data
+
+    def allocate_ids(self, user_id, kind, count=1):
+        with self._write() as conn:
+            conn.execute("INSERT OR IGNORE INTO id_counters (user_id, kind, next_id) VALUES (?, ?, 1)",
+                         (user_id, kind))
+            [(next_id,)] = conn.execute(
+                "UPDATE id_counters SET next_id = next_id + ? WHERE user_id = ? AND kind = ? "
+                "RETURNING next_id", (count, user_id, kind)).fetchall()
+        return next_id - count
+
+    def _insert_folder(self, conn, user_id, folder, revision):
+        conn.execute("INSERT INTO folders (user_id, id, name, description, icon, seq) VALUES (?, ?, ?, ?, ?, ?)",
+                     (user_id, folder.id, folder.name, folder.description, folder.icon, revision))
+
+    def _insert_account(self, conn, user_id, account, revision):
+        # The current balance is rebuilt from transactions on load
+        conn.execute(
+            "INSERT INTO accounts (user_id, id, folder_id, name, type, monthly_budget, target_amount, "
+            "deadline, opening_balance, created_at, seq) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (user_id, account.id, account.folder_id, account.name, account.type.value,
+             account.monthly_budget, account.target_amount, account.deadline,
+             account.opening_balance,
+             account.created_at, revision))
+
+    def save_folder(self, user_id, folder):
+        with self._write() as conn:
+            revision = self._bump_revision(conn, user_id)
+            self._insert_folder(conn, user_id, folder, revision)
+        return revision
+
+    def save_account(self, user_id, account):
+        with self._write() as conn:
+            revision = self._bump_revision(conn, user_id)
+            self._insert_account(conn, user_id, account, revision)
+        return revision
+
+    def save_transactions(self, user_id, transactions):
+        with self._write() as conn:
+            revision = self._bump_revision(conn, user_id)
+            conn.executemany(INSERT_TRANSACTION, (
+                (user_id, t.id, t.account_id, t.amount, t.description, t.category, t.timestamp,
+                 t.created_timestamp, revision)
+                for t in transactions
+            ))
+        return revision
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,106 @@
+"""Running aggregates kept on write (and taken back on removal) agree with their rows"""
+import random
+from datetime import datetime
+
+import pytest
+
+import bulk_import
+from models.account_stats import AccountStats, DailyTotals
+from models.timestamps import MICROS_PER_DAY, check_transaction_date, day_number, to_epoch
+
+BASE = to_epoch(datetime(2026, 1, 1))
+
+
+def test_newest_first_days_match_oldest_first():
+    rng = random.Random(16)
+    rows = [(-rng.uniform(1, 50) if rng.random() < 0.7 else rng.uniform(1, 50), BASE + day * MICROS_PER_DAY)
+            for day in range(2000)]
+    oldest_first, newest_first = DailyTotals(), DailyTotals()
+    for amount, timestamp in rows:
+        oldest_first.add(amount, timestamp)
+    for amount, timestamp in reversed(rows):
+        newest_first.add(amount, timestamp)
+
+    first = day_number(BASE)
+    for start, end in ((None, None), (first, first + 30), (first + 1000, first + 1999), (first - 5, first + 2)):
+        for income in (False, True):
+            assert newest_first.total(start, end, income) == pytest.approx(oldest_first.total(start, end, income))
+            assert newest_first.count(start, end, income) == oldest_first.count(start, end, income)
+    assert newest_first.first_active_day(first - 100) == oldest_first.first_active_day(first - 100)
+    assert newest_first.series(first, first + 9).tolist() == pytest.approx(oldest_first.series(first, first + 9).tolist())
+    # Spare days in front grow geometrically, not one shift per back-dated day
+    assert len(newest_first._values['spending']) <= 4 * 2000
+
+
+def test_dates_outside_the_window_are_rejected():
+    check_transaction_date(BASE)
+    for date in ('0001-01-01', '9999-12-31', '1899-12-31T23:59:59', '2100-01-01'):
+        with pytest.raises(ValueError, match='Date out of range'):
+            check_transaction_date(to_epoch(date))
+        with pytest.raises(ValueError, match='Date out of range'):
+            bulk_import.parse_record({'account_id': '1', 'amount': '-5', 'date': date}, {1: None})
+
+
+def build(rows):
+    stats = AccountStats()
+    for amount, timestamp in rows:
+        stats.add(amount, timestamp)
+    return stats
+
+
+def bounds(rows, income):
+    timestamps = [timestamp for amount, timestamp in rows if (amount > 0 if income else amount < 0)]
+    return min(timestamps), max(timestamps)
+
+
+def assert_same(actual, expected):
+    assert actual.count == expected.count
+    for name in ('expenses', 'income'):
+        got, want = getattr(actual, name), getattr(expected, name)
+        assert got.count == want.count
+        assert got.total == pytest.approx(want.total)
+        assert got.mean == pytest.approx(want.mean)
+        assert got.stdev() == pytest.approx(want.stdev())
+        assert (got.min_timestamp, got.max_timestamp) == (want.min_timestamp, want.max_timestamp)
+    for income in (False, True):
+        assert actual.daily.total(income=income) == pytest.approx(expected.daily.total(income=income))
+        assert actual.daily.count(income=income) == expected.daily.count(income=income)
+        first = day_number(BASE)
+        assert actual.daily.series(first, first + 59, income).tolist() == \
+            pytest.approx(expected.daily.series(first, first + 59, income).tolist())
+    for name in ('hourly_spend', 'hourly_counts', 'weekday_spend', 'weekday_counts'):
+        assert getattr(actual.times, name).tolist() == pytest.approx(getattr(expected.times, name).tolist())
+
+
+def test_removals_match_never_having_added():
+    rng = random.Random(23)
+    rows = [(round(rng.uniform(-80, 40), 2), BASE + rng.randint(0, 60 * MICROS_PER_DAY)) for _ in range(300)]
+    stats = build(rows)
+
+    remaining = list(rows)
+    for _ in range(120):
+        amount, timestamp = remaining.pop(rng.randrange(len(remaining)))
+        # Bounds are only needed when the removed row was at either end
+        first, last = bounds(remaining, amount > 0)
+        at_end = amount and not first < timestamp < last
+        stats.remove(amount, timestamp, (first, last) if at_end else None)
+
+    assert_same(stats, build(remaining))
+
+
+def test_correction_is_remove_then_add():
+    rows = [(-10.0, BASE), (-20.0, BASE + 5 * MICROS_PER_DAY), (15.0, BASE + MICROS_PER_DAY)]
+    stats = build(rows)
+    # The middle expense was really -25 a day later
+    stats.remove(-20.0, BASE + 5 * MICROS_PER_DAY, bounds=(BASE, BASE))
+    stats.add(-25.0, BASE + 6 * MICROS_PER_DAY)
+
+    assert_same(stats, build([rows[0], rows[2], (-25.0, BASE + 6 * MICROS_PER_DAY)]))
+
+
+def test_removing_an_end_needs_the_remaining_bounds():
+    stats = build([(-10.0, BASE), (-20.0, BASE + MICROS_PER_DAY)])
+    with pytest.raises(ValueError):
+        stats.remove(-20.0, BASE + MICROS_PER_DAY)
+    # Nothing was taken back by the failed call
+    assert_same(stats, build([(-10.0, BASE), (-20.0, BASE + MICROS_PER_DAY)]))
@@ -0,0 +1,52 @@
+"""Batch runs read the store without changing it"""
+import io
+import os
+from datetime import datetime
+
+import batch_insights
+import serialization
+from storage.log import LogStore
+from storage.sqlite import SQLiteStore
+from test_log_store import make_user
+
+
+def contents(directory):
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, directory)] = f.read()
+    return files
+
+
+def run(url):
+    output = io.StringIO()
+    batch_insights.run(url, output, workers=2, chunk_size=1, now=datetime(2026, 10, 15),
+                       progress=batch_insights.Progress(out=io.StringIO()))
+    return [serialization.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_log_store_is_left_as_it_was(tmp_path):
+    # Unsnapshotted writes that closing a writable store would compact
+    make_user(LogStore(str(tmp_path), snapshot_every=10_000))
+    before = contents(tmp_path)
+
+    lines = run(f'log:///{tmp_path}')
+
+    assert [line['user_id'] for line in lines] == ['u']
+    assert contents(tmp_path) == before
+
+
+def test_sqlite_store_is_left_as_it_was(tmp_path):
+    path = tmp_path / 'store.db'
+    store = SQLiteStore(str(path))
+    make_user(store)
+    store.close()
+    before = path.read_bytes()
+
+    lines = run(f'sqlite:///{path}')
+
+    # Readers of a WAL database may leave -wal and -shm files, but the database is untouched
+    assert [line['user_id'] for line in lines] == ['u']
+    assert path.read_bytes() == before
@@ -0,0 +1,16 @@
+"""Many threads writing and reading one user keep its ledgers consistent"""
+import os
+
+os.environ.setdefault('PENNYPINCHER_STORE', 'memory://')
+
+from benchmarks import stress_concurrency
+
+
+def test_concurrent_writers_and_readers_keep_invariants():
+    counts, other_counts, errors, problems, _ = stress_concurrency.run(writers=4, readers=4, duration=1.0)
+
+    assert errors == []
+    assert problems == []
+    assert counts['transactions'] and counts['reads']
+    # The other user's writer wasn't held up behind the first user's lock
+    assert other_counts['transactions']
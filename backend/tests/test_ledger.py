@@ -0,0 +1,58 @@
+"""Ledger batches keep the (timestamp, id) index in order"""
+import random
+from datetime import datetime, timedelta
+
+from models.account import Account
+from models.ledger import Ledger
+from models.transaction import Transaction
+
+BASE = datetime(2026, 1, 1)
+
+
+def transaction(transaction_id, date, amount=-1.0):
+    return Transaction(transaction_id, amount, f'tx {transaction_id}', 1, 'food', date=date)
+
+
+def keys(ledger):
+    rows = ledger.index.rows
+    return list(zip(ledger.timestamps[rows].tolist(), ledger.ids[rows].tolist()))
+
+
+def test_newest_first_batch_is_indexed_oldest_first():
+    ledger = Ledger()
+    batch = [transaction(i, BASE - timedelta(hours=i)) for i in range(1, 1001)]
+    ledger.extend(batch)
+
+    assert len(ledger) == len(ledger.index) == 1000
+    assert ledger.index.ids.tolist() == list(range(1000, 0, -1))
+    assert keys(ledger) == sorted(keys(ledger))
+    # Rows still point at their own transactions
+    assert ledger.transaction(int(ledger.index.rows[0])).id == 1000
+
+
+def test_batches_merge_with_existing_rows():
+    rng = random.Random(8)
+    ledger = Ledger()
+    next_id = 1
+    for _ in range(20):
+        batch = []
+        for _ in range(rng.randint(0, 50)):
+            # Same-second ties are ordered by id
+            batch.append(transaction(next_id, BASE + timedelta(seconds=rng.randint(0, 300))))
+            next_id += 1
+        if rng.random() < 0.3 and batch:
+            ledger.append(batch.pop())
+        ledger.extend(batch)
+        assert keys(ledger) == sorted(zip(ledger.timestamps.tolist(), ledger.ids.tolist()))
+
+
+def test_account_batch_matches_one_at_a_time():
+    batch = [transaction(i, BASE - timedelta(days=i % 40, minutes=i), amount=-float(i)) for i in range(1, 301)]
+    batched, single = Account(1, 'a', 'expense', 1), Account(1, 'a', 'expense', 1)
+    batched.add_transactions(batch)
+    for item in batch:
+        single.add_transaction(item)
+
+    assert keys(batched.ledger) == keys(single.ledger)
+    assert batched.current_balance == single.current_balance
+    assert batched.stats.daily.total() == single.stats.daily.total()
@@ -0,0 +1,65 @@
+"""Crash recovery of the write-ahead log store"""
+import glob
+import os
+
+from models.account import Account
+from models.folder import Folder
+from models.transaction import Transaction
+from storage.log import LogStore
+
+
+def save_transaction(store, user_id, user_data, amount):
+    transaction_id = store.allocate_ids(user_id, 'transaction')
+    transaction = Transaction(transaction_id, amount, f'tx {transaction_id}', 1, 'food', date='2026-10-01T12:00:00')
+    store.save_transactions(user_id, [transaction])
+    user_data['accounts'][1].add_transaction(transaction)
+    user_data['transactions'][transaction_id] = 1
+    return transaction_id
+
+
+def open_store(directory):
+    # A store that is never closed stands in for a crashed process: every
+    # save returned only once it was synced, but there is no final snapshot
+    return LogStore(str(directory), snapshot_every=10_000)
+
+
+def make_user(store):
+    user_data = store.create_user('u', [Folder(1, 'f')], [Account(1, 'a', 'expense', 1)])
+    for amount in (-10, -20, 5):
+        save_transaction(store, 'u', user_data, amount)
+
+
+def tear_tail(directory):
+    [segment] = glob.glob(os.path.join(str(directory), 'log-*.ndjson'))
+    with open(segment, 'ab') as f:
+        f.write(b'{"op": "transactions", "user": "u", "ro')
+
+
+def test_torn_tail_is_dropped_and_later_writes_survive(tmp_path):
+    make_user(open_store(tmp_path))
+    tear_tail(tmp_path)
+
+    recovered = open_store(tmp_path)
+    user_data = recovered.load_user('u')
+    assert len(user_data['transactions']) == 3
+    new_id = save_transaction(recovered, 'u', user_data, -7)
+
+    # Reopen twice: the write acknowledged after recovery must replay cleanly
+    for _ in range(2):
+        reopened = open_store(tmp_path)
+        user_data = reopened.load_user('u')
+        assert sorted(user_data['transactions']) == [1, 2, 3, new_id]
+        assert user_data['accounts'][1].current_balance == -32
+
+
+def test_close_after_torn_tail(tmp_path):
+    make_user(open_store(tmp_path))
+    tear_tail(tmp_path)
+
+    recovered = open_store(tmp_path)
+    save_transaction(recovered, 'u', recovered.load_user('u'), -1)
+    recovered.close()
+
+    reopened = open_store(tmp_path)
+    assert len(reopened.load_user('u')['transactions']) == 4
+    reopened.close()
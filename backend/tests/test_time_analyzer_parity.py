@@ -0,0 +1,142 @@
+"""The vectorized and pure-Python TimeAnalyzer paths must give identical insights"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import instrumentation
+from insights.time_analyzer import TimeAnalyzer
+from insights.user_insights import UserInsights
+from models.account import Account, AccountType
+from models.folder import Folder
+from models.transaction import Transaction
+
+BASE = datetime(2026, 1, 1)
+
+
+def build_account(seed, count, hours=None, weekend=False, income_share=0.2):
+    rng = random.Random(seed)
+    account = Account(1, 'test', AccountType.EXPENSE, 1, monthly_budget=100)
+    for transaction_id in range(1, count + 1):
+        date = BASE + timedelta(days=rng.randint(0, 300), hours=rng.choice(hours or range(24)),
+                                minutes=rng.randint(0, 59))
+        if weekend:
+            while date.weekday() < 5:
+                date += timedelta(days=1)
+        amount = rng.uniform(0, 50) if rng.random() < income_share else -rng.uniform(0.01, 100)
+        account.add_transaction(Transaction(transaction_id, round(amount, 2), 'd', 1, date=date))
+    return account
+
+
+def both(account, **kwargs):
+    vectorized = TimeAnalyzer(vectorized=True, **kwargs).analyze_account_patterns(account)
+    python = TimeAnalyzer(vectorized=False, **kwargs).analyze_account_patterns(account)
+    return vectorized, python
+
+
+SHAPES = [
+    {},
+    {'hours': [22, 23, 0, 1, 2]},  # late night, wrapping past midnight
+    {'hours': [10, 11], 'weekend': True},
+    {'hours': [6, 7]},
+    {'income_share': 0.9},
+]
+
+
+@pytest.mark.parametrize('seed', range(40))
+@pytest.mark.parametrize('shape', SHAPES)
+def test_randomized_ledgers(seed, shape):
+    account = build_account(seed, random.Random(seed).randint(0, 120), **shape)
+    vectorized, python = both(account)
+    assert vectorized == python
+
+
+def test_empty_account():
+    assert both(Account(1, 'empty', AccountType.EXPENSE, 1)) == (None, None)
+
+
+def test_single_expense():
+    account = Account(1, 'one', AccountType.EXPENSE, 1)
+    account.add_transaction(Transaction(1, -12.5, 'coffee', 1, date='2026-03-07T08:30:00'))
+    vectorized, python = both(account)
+    assert vectorized == python
+    assert vectorized['time_of_day']['dominant_period'] == 'Early morning (5 - 9 AM)'
+    assert 'spending_velocity' not in vectorized
+
+
+def test_income_only():
+    account = Account(1, 'income', AccountType.CHECKING, 1)
+    for transaction_id in range(1, 4):
+        account.add_transaction(Transaction(transaction_id, 100, 'pay', 1, date=f'2026-03-0{transaction_id}'))
+    assert both(account) == (None, None)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_custom_buckets(seed):
+    buckets = {'morning': (6, 12), 'night': (20, 2)}
+    account = build_account(seed, 60, hours=[7, 8, 21, 23, 1, 15])
+    vectorized, python = both(account, time_buckets=buckets)
+    assert vectorized == python
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_bulk_loaded_account(seed):
+    # Accounts loaded column-wise (snapshots, exports) keep the same histograms
+    account = build_account(seed, 80)
+    ledger = account.ledger
+    loaded = Account(1, 'loaded', AccountType.EXPENSE, 1)
+    loaded.add_columns(ledger.ids.copy(), ledger.amounts.copy(), ledger.timestamps.copy(),
+                       ledger.created_timestamps.copy(), ledger.category_codes.copy(),
+                       ledger.categories, list(ledger.descriptions))
+    assert both(loaded)[0] == both(account)[1]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_user_insights_match_account_patterns(seed):
+    accounts = [build_account(seed * 10 + i, 50) for i in range(3)]
+    for account_id, account in enumerate(accounts, start=1):
+        account.id = account_id
+    user_data = {'folders': {1: Folder(1, 'f')}, 'accounts': {a.id: a for a in accounts}, 'transactions': {}}
+    patterns = UserInsights(TimeAnalyzer(vectorized=False)).analyze_user(user_data)['accounts']
+    for account in accounts:
+        assert patterns[account.id] == TimeAnalyzer(vectorized=False).analyze_account_patterns(account)
+
+
+def test_user_insights_with_missing_folders():
+    accounts = [build_account(i, 40) for i in range(3)]
+    for account_id, (account, folder_id) in enumerate(zip(accounts, (1, None, 99)), start=1):
+        account.id, account.folder_id = account_id, folder_id
+    user_data = {'folders': {1: Folder(1, 'f')}, 'accounts': {a.id: a for a in accounts}, 'transactions': {}}
+    insights = UserInsights(TimeAnalyzer(vectorized=False)).analyze_user(user_data)
+
+    # Unfoldered accounts are left out of the folder list but count everywhere else
+    [folder] = insights['folders']
+    assert folder['id'] == 1
+    assert folder['total_spending'] == round(accounts[0].stats.expenses.total, 2)
+    assert insights['total_spending'] == round(sum(a.stats.expenses.total for a in accounts), 2)
+    for account in accounts:
+        assert insights['accounts'][account.id] == TimeAnalyzer(vectorized=False).analyze_account_patterns(account)
+
+
+def test_velocity_gaps_follow_appends_and_rebuild_once():
+    account = Account(1, 'gaps', AccountType.EXPENSE, 1)
+    for transaction_id, day in enumerate((1, 2, 4, 9, 9), start=1):
+        account.add_transaction(Transaction(transaction_id, -5, 'd', 1, date=BASE + timedelta(days=day)))
+    gaps = account.stats.gaps
+    assert not gaps.stale and gaps.sums == (4, 8, 1 + 4 + 25)
+    # In date order, the vectorized path doesn't read the ledger at all
+    token = instrumentation._scanned.set([0])
+    try:
+        TimeAnalyzer(vectorized=True).analyze_account_patterns(account)
+        assert instrumentation._scanned.get() == [0]
+    finally:
+        instrumentation._scanned.reset(token)
+
+    # A back-dated expense and a bulk load out of order both need one rebuild
+    account.add_transaction(Transaction(6, -5, 'd', 1, date=BASE))
+    account.add_transactions([Transaction(7, -5, 'd', 1, date=BASE + timedelta(days=30)),
+                              Transaction(8, -5, 'd', 1, date=BASE + timedelta(days=20))])
+    assert gaps.stale
+    vectorized, python = both(account)
+    assert vectorized == python
+    assert not gaps.stale and gaps.sums == (7, 30, 1 + 1 + 4 + 25 + 121 + 100)
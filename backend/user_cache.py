@@ -0,0 +1,159 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Rough fixed cost of the objects around a user, a folder or account, and a
+# transaction id in the user's transaction index
+USER_BYTES = 1024
+OBJECT_BYTES = 512
+INDEX_ENTRY_BYTES = 100
+
+
+def user_bytes(user_data):
+    """Approximate memory held by a user's models"""
+    size = USER_BYTES + OBJECT_BYTES * (len(user_data['folders']) + len(user_data['accounts']))
+    size += INDEX_ENTRY_BYTES * len(user_data['transactions'])
+    for account in user_data['accounts'].values():
+        size += account.ledger.nbytes + account.stats.daily.nbytes
+    return size
+
+
+class UserCache:
+    """LRU cache of loaded users, bounded by their approximate memory use.
+
+    Users are added when first loaded from the store and evicted least
+    recently used first once the total passes `max_bytes`; the most recent
+    user is always kept, however large. Writes grow a user, so the app
+    calls resize() after changing one. `on_evict(user_id)` is called for
+    every evicted user, outside the cache lock.
+
+    Evicting only drops the cache's reference: a request still holding the
+    user finishes normally, and the next one reloads it from the store.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, on_evict=None):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # user_id -> (user_data, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return user_id in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, user_id):
+        """Return the cached user data, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user_id, user_data):
+        size = user_bytes(user_data)
+        with self._lock:
+            old = self._entries.pop(user_id, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[user_id] = (user_data, size)
+            self._bytes += size
+            evicted = self._evict()
+        self._notify(evicted)
+
+    def resize(self, user_id):
+        """Re-measure a cached user after it changed"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+        size = user_bytes(entry[0])
+        with self._lock:
+            if self._entries.get(user_id) is not entry:
+                return
+            self._entries[user_id] = (entry[0], size)
+            self._bytes += size - entry[1]
+            evicted = self._evict()
+        self._notify(evicted)
+
+    def discard(self, user_id):
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def _evict(self):
+        evicted = []
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            user_id, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            evicted.append(user_id)
+        return evicted
+
+    def _notify(self, evicted):
+        if self.on_evict is not None:
+            for user_id in evicted:
+                self.on_evict(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'users': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions
+            }
+
+
+class ResidentUsers:
+    """Stands in for UserCache in front of a resident store (memory or log).
+
+    Such a store already holds every user in memory and can't reload one
+    it let go of, so a byte budget could free nothing. Lookups go straight
+    to the store and there is nothing to size or evict.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __contains__(self, user_id):
+        return self.store.load_user(user_id) is not None
+
+    def get(self, user_id):
+        return self.store.load_user(user_id)
+
+    def put(self, user_id, user_data):
+        pass
+
+    def resize(self, user_id):
+        pass
+
+    def discard(self, user_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'resident': True, 'users': sum(1 for _ in self.store.user_ids())}
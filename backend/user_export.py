@@ -0,0 +1,253 @@
+"""Compact binary export and import of a user's folders, accounts and transactions.
+
+An export is an uncompressed NumPy .npz archive:
+
+- `header`: UTF-8 JSON (as uint8) with the format version, the folders,
+  the accounts (each with its [start, end) range of transaction rows) and
+  the category names.
+- One column per transaction field, concatenated over every account, with
+  each account's rows in (timestamp, id) order. Categories are codes into
+  the header's list.
+- `description_offsets` and `description_bytes`: the descriptions as one
+  block of UTF-8 with the start offset of each (plus the end).
+
+Any NumPy can read it with np.load. open_export() instead memory-maps the
+columns straight out of the archive and builds models over them without a
+Transaction object per row, so the analyzers can run over exports that are
+larger than memory would otherwise allow.
+"""
+import struct
+import zipfile
+from contextlib import nullcontext
+
+import numpy as np
+
+import serialization
+from models.account import Account
+from models.folder import Folder
+from models.ledger import Ledger
+from models.timestamps import check_transaction_date
+from models.transaction import Transaction
+from storage import advance_revision
+from storage.base import build_user_data
+
+FORMAT = 'pennypincher-user'
+FORMAT_VERSION = 1
+
+COLUMNS = {
+    'ids': np.int64,
+    'amounts': np.float64,
+    'timestamps': np.int64,
+    'created_timestamps': np.int64,
+    'category_codes': np.int32,
+}
+
+# Transactions saved to the store per batch when importing
+IMPORT_BATCH_SIZE = 10_000
+
+
+class PackedStrings:
+    """Read-only strings decoded on demand from one UTF-8 block, plus any appended after"""
+
+    def __init__(self, offsets, data):
+        self._offsets = offsets
+        self._data = data
+        self._packed = max(0, len(offsets) - 1)
+        self._tail = []
+
+    def __len__(self):
+        return self._packed + len(self._tail)
+
+    def _get(self, index):
+        if index >= self._packed:
+            return self._tail[index - self._packed]
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return bytes(self._data[start:end]).decode('utf-8')
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._get(index)
+
+    def __iter__(self):
+        return (self._get(i) for i in range(len(self)))
+
+    def append(self, value):
+        self._tail.append(value)
+
+    def extend(self, values):
+        self._tail.extend(values)
+
+
+def export_user(user_data, file):
+    """Write a user to `file` (a path or binary file object).
+
+    Hold the user's read lock while this runs.
+    """
+    categories = {}
+    parts = {name: [] for name in COLUMNS}
+    descriptions = []
+    accounts = []
+    offset = 0
+    for account in list(user_data['accounts'].values()):
+        ledger = account.ledger
+        order = ledger.index.rows
+        size = len(order)
+        lookup = np.array([categories.setdefault(name, len(categories)) for name in ledger.categories],
+                          dtype=np.int32)
+        parts['ids'].append(ledger.ids[order])
+        parts['amounts'].append(ledger.amounts[order])
+        parts['timestamps'].append(ledger.timestamps[order])
+        parts['created_timestamps'].append(ledger.created_timestamps[order])
+        parts['category_codes'].append(lookup[ledger.category_codes[order]] if size else
+                                       np.empty(0, dtype=np.int32))
+        descriptions.extend(ledger.descriptions[row].encode('utf-8') for row in order.tolist())
+        accounts.append([account.id, account.folder_id, account.name, account.type.value,
+                         account.monthly_budget, account.target_amount, account.deadline,
+                         account.opening_balance, account.created_at, offset, offset + size])
+        offset += size
+
+    header = {
+        'format': FORMAT,
+        'version': FORMAT_VERSION,
+        'folders': [[folder.id, folder.name, folder.description, folder.icon]
+                    for folder in list(user_data['folders'].values())],
+        'accounts': accounts,
+        'categories': list(categories),
+    }
+    arrays = {'header': np.frombuffer(serialization.dumps(header).encode(), dtype=np.uint8)}
+    for name, dtype in COLUMNS.items():
+        arrays[name] = np.concatenate(parts[name]).astype(dtype) if parts[name] else np.empty(0, dtype=dtype)
+    lengths = np.fromiter((len(text) for text in descriptions), dtype=np.int64, count=len(descriptions))
+    arrays['description_offsets'] = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+    arrays['description_bytes'] = np.frombuffer(b''.join(descriptions), dtype=np.uint8)
+    np.savez(file, **arrays)
+
+
+def _members(file):
+    """Memory-map every array stored in an uncompressed .npz"""
+    arrays = {}
+    with zipfile.ZipFile(file) as archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("Compressed exports can't be memory-mapped")
+            # The local header's name and extra field lengths can differ from the central directory's
+            file.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', file.read(4))
+            file.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(file)
+            name = info.filename[:-len('.npy')]
+            if not np.prod(shape):
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(file, dtype=dtype, mode='r', offset=file.tell(), shape=shape,
+                                         order='F' if fortran else 'C')
+    return arrays
+
+
+def open_export(file):
+    """Load an export as a user data dict whose ledgers are memory-mapped from `file`.
+
+    `file` is a path or a binary file object with a real file descriptor.
+    Account stats are rebuilt from the columns with NumPy; descriptions are
+    decoded only when read. Raises ValueError for an invalid export,
+    including one with dates outside the accepted range.
+    """
+    context = open(file, 'rb') if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__') else nullcontext(file)
+    with context as f:
+        arrays = _members(f)
+
+    header = serialization.loads(bytes(arrays['header']))
+    if header.get('format') != FORMAT or header.get('version') != FORMAT_VERSION:
+        raise ValueError("Not a PennyPincher user export (or an unsupported version)")
+    missing = [name for name in (*COLUMNS, 'description_offsets', 'description_bytes') if name not in arrays]
+    if missing:
+        raise ValueError(f"Export is missing columns: {', '.join(missing)}")
+    if len(arrays['timestamps']):
+        check_transaction_date(int(arrays['timestamps'].min()))
+        check_transaction_date(int(arrays['timestamps'].max()))
+
+    offsets, data = arrays['description_offsets'], arrays['description_bytes']
+    folders = [Folder(*row) for row in header['folders']]
+    accounts = []
+    index = {}
+    for row in header['accounts']:
+        (account_id, folder_id, name, account_type, budget, target, deadline,
+         balance, created_at, start, end) = row
+        account = Account(account_id, name, account_type, folder_id, monthly_budget=budget,
+                          target_amount=target, deadline=deadline, current_balance=balance)
+        account.created_at = created_at
+        columns = {name: arrays[name][start:end] for name in COLUMNS}
+        account.attach_ledger(Ledger.from_columns(
+            columns['ids'], columns['amounts'], columns['timestamps'], columns['created_timestamps'],
+            account_id, columns['category_codes'], header['categories'],
+            PackedStrings(offsets[start:end + 1], data)))
+        index.update(dict.fromkeys(columns['ids'].tolist(), account_id))
+        accounts.append(account)
+
+    user_data = build_user_data(folders, accounts)
+    user_data['transactions'] = index
+    return user_data
+
+
+def import_user(store, user_id, exported, on_added=None):
+    """Create `user_id` in the store from an opened export; returns its user data, or None if it exists.
+
+    Folders and accounts are numbered from 1 and transactions get fresh ids
+    from the store, keeping their order, so an export can be imported under
+    any user id. Transactions are saved in batches of IMPORT_BATCH_SIZE.
+    `on_added(account, transactions)` is called after each batch.
+    """
+    folder_ids = {folder_id: new_id for new_id, folder_id in enumerate(sorted(exported['folders']), start=1)}
+    account_ids = {account_id: new_id for new_id, account_id in enumerate(sorted(exported['accounts']), start=1)}
+
+    folders = []
+    for old_id, new_id in folder_ids.items():
+        folder = exported['folders'][old_id]
+        folders.append(Folder(new_id, folder.name, folder.description, folder.icon))
+    accounts = []
+    for old_id, new_id in account_ids.items():
+        source = exported['accounts'][old_id]
+        account = Account(new_id, source.name, source.type.value, folder_ids[source.folder_id],
+                          monthly_budget=source.monthly_budget, target_amount=source.target_amount,
+                          deadline=source.deadline, current_balance=source.opening_balance)
+        account.created_at = source.created_at
+        accounts.append(account)
+
+    user_data = store.create_user(user_id, folders, accounts)
+    if user_data is None:
+        return None
+
+    # Fresh transaction ids in the order of the exported ones
+    old_ids = np.sort(np.fromiter(exported['transactions'], dtype=np.int64, count=len(exported['transactions'])))
+    first_id = store.allocate_ids(user_id, 'transaction', len(old_ids)) if len(old_ids) else 1
+    index = user_data['transactions']
+
+    for old_account_id, new_account_id in account_ids.items():
+        ledger = exported['accounts'][old_account_id].ledger
+        account = user_data['accounts'][new_account_id]
+        for start in range(0, len(ledger), IMPORT_BATCH_SIZE):
+            rows = np.arange(start, min(start + IMPORT_BATCH_SIZE, len(ledger)))
+            ids = first_id + np.searchsorted(old_ids, ledger.ids[rows])
+            transactions = [
+                Transaction.from_row(transaction_id, amount, ledger.descriptions[row], new_account_id,
+                                     ledger.categories[code], timestamp, created)
+                for row, transaction_id, amount, code, timestamp, created in zip(
+                    rows.tolist(), ids.tolist(), ledger.amounts[rows].tolist(),
+                    ledger.category_codes[rows].tolist(), ledger.timestamps[rows].tolist(),
+                    ledger.created_timestamps[rows].tolist())
+            ]
+            advance_revision(user_data, store.save_transactions(user_id, transactions))
+            account.add_transactions(transactions)
+            index.update((transaction.id, new_account_id) for transaction in transactions)
+            if on_added is not None:
+                on_added(account, transactions)
+    return user_data
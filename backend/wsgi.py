@@ -0,0 +1,12 @@
+"""WSGI entry point for multi-process servers, e.g.
+
+    gunicorn --workers 4 --bind 0.0.0.0:5000 wsgi:application
+
+or, without extra dependencies, `python serve.py --workers 4`.
+
+Each worker process keeps its own in-memory copy of the users it serves
+and catches up on other workers' writes through the store, so
+PENNYPINCHER_STORE must name a shared store such as
+sqlite:///data/pennypincher.db?shards=8 rather than memory:// or log://.
+"""
+from app import app as application
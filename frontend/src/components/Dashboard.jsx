@@ -11,17 +11,14 @@ const Dashboard = ({ userData, onDataUpdate, userId }) => {
   }, [userData])
 
   const loadAccountInsights = async () => {
-    const insights = {}
     if (userData && userData.accounts) {
-      for (const account of userData.accounts.slice(0, 5)) {
-        try {
-          const response = await axios.get(`/api/${userId}/accounts/${account.id}/insights`)
-          insights[account.id] = response.data.insights
-        } catch (error) {
-          console.error(`Error loading insights for account ${account.id}:`, error)
-        }
+      try {
+        // One request for every account's insights
+        const response = await axios.get(`/api/${userId}/accounts/insights`)
+        setAccountInsights(response.data.insights)
+      } catch (error) {
+        console.error('Error loading account insights:', error)
       }
-      setAccountInsights(insights)
     }
   }
 
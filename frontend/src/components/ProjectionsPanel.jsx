@@ -1,27 +1,23 @@
 import React, { useState, useEffect } from 'react'
 
-const ProjectionsPanel = ({ accounts }) => {
+const ProjectionsPanel = ({ accounts, accountInsights }) => {
     const [projections, setProjections] = useState({})
 
     useEffect(() => {
         loadProjections()
-    }, [accounts])
+    }, [accounts, accountInsights])
 
-    const loadProjections = async () => {
+    const loadProjections = () => {
+        // Insights for every account are fetched once by the dashboard
         const newProjections = {}
 
         for (const account of accounts.slice(0, 5)) {
-            try {
-                const response = await fetch('/api/user1/accounts/${account.id}/insights')
-                const data = await response.json()
-                if (data.insights?.projections) {
-                    newProjects[account.id] = {
-                        name: account.name,
-                        ...data.insights.projections
-                    }
+            const insights = accountInsights?.[account.id]
+            if (insights?.projections) {
+                newProjections[account.id] = {
+                    name: account.name,
+                    ...insights.projections
                 }
-            } catch (error) {
-                console.error('Error loading projections:', error)
             }
         }
 